@@ -0,0 +1,162 @@
+class NodeAttributes:
+    """
+        Columnar store of node attributes ("type", "site" and any extra
+        fields). Each field is a column with one value per row, rows are
+        kept in insertion order, and removed nodes leave a gap that is
+        compacted away once gaps outnumber nodes.
+        Fields in INDEXED have secondary indexes of value -> nodes kept up
+        to date on every change, so selecting by site or type only touches
+        the matching nodes; other fields are scanned.
+    """
+    INDEXED = ("site", "type")
+
+    def __init__(self) -> None:
+        self.__names: list[str] = [] # row -> node (None for a removed node)
+        self.__rows: dict[str, int] = {} # node -> row
+        self.__columns: dict[str, list] = {}
+        self.__indexes: dict[str, dict] = {field: {} for field in self.INDEXED}
+
+    @classmethod
+    def from_columns(cls, nodes: list[str], columns: dict[str, list]) -> "NodeAttributes":
+        """
+            Builds the store from attribute columns in node order
+            (see columns), as saved with a snapshot.
+        """
+        store = cls()
+        store.__names = list(nodes)
+        store.__rows = {node: i for i, node in enumerate(nodes)}
+        store.__columns = {field: list(values) for field, values in columns.items()}
+        for field in cls.INDEXED:
+            for node, value in zip(nodes, store.__columns.get(field, ())):
+                if value is not None:
+                    store.__indexes[field].setdefault(value, set()).add(node)
+        return store
+
+    def __contains__(self, node: str) -> bool:
+        return node in self.__rows
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+    def add(self, node: str, fields: dict) -> None:
+        """
+            Adds a node with the given attribute values,
+            replacing any it already had.
+        """
+        if node in self.__rows:
+            self.remove(node)
+        row = len(self.__names)
+        self.__names.append(node)
+        self.__rows[node] = row
+        for column in self.__columns.values():
+            column.append(None)
+        for field, value in fields.items():
+            self.set(node, field, value)
+
+    def remove(self, node: str) -> None:
+        for field in self.__indexes:
+            self.__unindex(field, self.value(node, field), node)
+        row = self.__rows.pop(node)
+        self.__names[row] = None
+        for column in self.__columns.values():
+            column[row] = None
+        if len(self.__names) > 2 * len(self.__rows) + 16:
+            self.__compact()
+
+    def set(self, node: str, field: str, value) -> None:
+        """
+            Sets one attribute of a node (None clears it).
+        """
+        row = self.__rows[node]
+        column = self.__columns.get(field)
+        if column is None:
+            column = self.__columns[field] = [None] * len(self.__names)
+        if field in self.__indexes:
+            self.__unindex(field, column[row], node)
+            if value is not None:
+                self.__indexes[field].setdefault(value, set()).add(node)
+        column[row] = value
+
+    def value(self, node: str, field: str):
+        """
+            Returns one attribute of a node, or None if it isn't set.
+        """
+        column = self.__columns.get(field)
+        row = self.__rows.get(node)
+        return None if column is None or row is None else column[row]
+
+    def get(self, node: str) -> dict:
+        """
+            Returns a node's attributes as a dictionary.
+        """
+        row = self.__rows[node]
+        return {field: column[row] for field, column in self.__columns.items() if column[row] is not None}
+
+    def values(self, field: str) -> list:
+        """
+            Returns the distinct values of a field, e.g. every site.
+        """
+        if field in self.__indexes:
+            return list(self.__indexes[field])
+        return list(dict.fromkeys(v for v in self.__columns.get(field, ()) if v is not None))
+
+    def select(self, **criteria) -> list[str]:
+        """
+            Returns the nodes whose attributes match every criterion, in
+            insertion order. A criterion is a value, or a list, tuple or
+            set of accepted values. Indexed fields are looked up first,
+            so the rest are only checked on their matches.
+        """
+        candidates = None
+        scanned = {}
+        for field, accepted in criteria.items():
+            accepted = set(accepted) if isinstance(accepted, (list, tuple, set)) else {accepted}
+            if field not in self.__indexes:
+                scanned[field] = accepted
+                continue
+            index = self.__indexes[field]
+            matches = {node for value in accepted for node in index.get(value, ())}
+            candidates = matches if candidates is None else candidates & matches
+
+        rows = self.__rows
+        if candidates is None:
+            candidates = rows.keys()
+        selected = sorted(rows[node] for node in candidates)
+        for field, accepted in scanned.items():
+            column = self.__columns.get(field)
+            selected = [row for row in selected if column is not None and column[row] in accepted]
+        return [self.__names[row] for row in selected]
+
+    def columns(self, nodes: list[str]) -> dict[str, list]:
+        """
+            Returns every field as a list of values in the given node
+            order (None where a node doesn't have the field).
+        """
+        rows = [self.__rows.get(node) for node in nodes]
+        return {field: [None if row is None else column[row] for row in rows]
+                for field, column in self.__columns.items()
+                if any(column[row] is not None for row in rows if row is not None)}
+
+    def copy(self) -> "NodeAttributes":
+        store = NodeAttributes()
+        store.__names = self.__names.copy()
+        store.__rows = self.__rows.copy()
+        store.__columns = {field: column.copy() for field, column in self.__columns.items()}
+        store.__indexes = {field: {value: nodes.copy() for value, nodes in index.items()}
+                           for field, index in self.__indexes.items()}
+        return store
+
+    def __unindex(self, field: str, value, node: str) -> None:
+        if value is None:
+            return
+        nodes = self.__indexes[field].get(value)
+        if nodes is not None:
+            nodes.discard(node)
+            if not nodes:
+                del self.__indexes[field][value]
+
+    def __compact(self) -> None:
+        keep = [row for row, node in enumerate(self.__names) if node is not None]
+        self.__names = [self.__names[row] for row in keep]
+        self.__rows = {node: i for i, node in enumerate(self.__names)}
+        self.__columns = {field: [column[row] for row in keep] for field, column in self.__columns.items()}
@@ -0,0 +1,124 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+from graph import Graph
+from pathfinder import PathFinder
+from metric import *
+from dataset import generate_columns
+from generators import GENERATORS, generate
+
+# Metrics that need every source's shortest paths, skipped above --max-all-pairs nodes
+ALL_PAIRS_METRICS = {
+    "nearest_neighbour_frequency": nearest_neighbour_frequency,
+    "closeness_centrality": closeness_centrality,
+    "average_shortest_path": average_shortest_path,
+    "betweenness_centrality": betweenness_centrality,
+    "edge_betweenness": edge_betweenness,
+    "flow_count": flow_count,
+    "node_flow_count": node_flow_count,
+}
+
+def run(kinds: list[str], sizes: list[int], max_all_pairs: int, variants: int, seed: int) -> list[dict]:
+    """
+        Times graph construction, single-source path finding, every metric
+        (each with a cold cache), the shared metrics view and the dataset
+        pipeline on each generated topology.
+        Returns one result dictionary per measurement.
+    """
+    results = []
+
+    for kind in kinds:
+        for size in sizes:
+            topology = generate(kind, size, seed)
+            n, m = len(topology["nodes"]), len(topology["links"])
+
+            def record(name: str, seconds: float | None) -> None:
+                results.append({"kind": kind, "size": size, "nodes": n, "links": m,
+                                "benchmark": name, "seconds": seconds})
+                print(f"{kind:>10} {n:>7} {name:<30} {'skipped' if seconds is None else f'{seconds:.4f}s'}")
+
+            g, seconds = __timed(Graph, topology)
+            record("build_graph", seconds)
+            record("snapshot", __timed(g.snapshot)[1])
+
+            start = next(iter(g.get_nodes()))
+            pf = PathFinder(g)
+            record("dijkstras", __timed(pf.dijkstras, start)[1])
+            record("sssp", __timed(pf.distances, start)[1])
+
+            record("node_to_edge_ratio", __timed(node_to_edge_ratio, g)[1])
+            record("average_connectivity", __timed(average_connectivity, g)[1])
+            record("degree_centrality", __timed(degree_centrality, g)[1])
+            record("redundancy_report", __timed(redundancy_report, g)[1])
+
+            all_pairs = n <= max_all_pairs
+            for name, metric in ALL_PAIRS_METRICS.items():
+                g.cache.clear()
+                record(name, __timed(metric, g)[1] if all_pairs else None)
+
+            # a single failure, after the shared baseline has been built
+            record("failure_impact_score", __timed(failure_impact_score, g, start)[1] if all_pairs else None)
+
+            g.cache.clear()
+            record("metrics_view", __timed(__metrics_view, g)[1] if all_pairs else None)
+
+            g.cache.clear()
+            record(f"dataset_{variants}_variants",
+                   __timed(generate_columns, g, list(range(variants)), seed)[1] if all_pairs else None)
+
+    return results
+
+def compare(results: list[dict], baseline: list[dict]) -> None:
+    """
+        Prints the time ratio of each measurement against a previous run.
+    """
+    previous = {(r["kind"], r["size"], r["benchmark"]): r["seconds"] for r in baseline}
+    for r in results:
+        old = previous.get((r["kind"], r["size"], r["benchmark"]))
+        if old and r["seconds"]:
+            print(f"{r['kind']:>10} {r['nodes']:>7} {r['benchmark']:<30} {r['seconds'] / old:.2f}x")
+
+def __metrics_view(graph: Graph) -> None:
+    for metric in ALL_PAIRS_METRICS.values():
+        metric(graph)
+
+def __timed(func, *args) -> tuple:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def __commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmark over synthetic topologies")
+    parser.add_argument("--kinds", nargs="+", choices=GENERATORS, default=GENERATORS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000, 100000])
+    parser.add_argument("--max-all-pairs", type=int, default=2000,
+                        help="skip all-sources metrics above this many nodes")
+    parser.add_argument("--variants", type=int, default=2, help="variants in the dataset benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args.kinds, args.sizes, args.max_all_pairs, args.variants, args.seed)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": __commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f)["results"])
@@ -0,0 +1,252 @@
+import argparse
+import json
+import math
+import os
+import sys
+from graph import Graph
+from journal import open_graph
+from metric import *
+import parallel
+import sampling
+import distmatrix
+import hierarchy
+
+# Metrics computed by the metrics command, by name
+METRICS = {
+    "node_to_edge_ratio": node_to_edge_ratio,
+    "average_connectivity": average_connectivity,
+    "average_shortest_path": average_shortest_path,
+    "degree_centrality": degree_centrality,
+    "closeness_centrality": closeness_centrality,
+    "nearest_neighbour_frequency": nearest_neighbour_frequency,
+    "betweenness_centrality": betweenness_centrality,
+    "edge_betweenness": edge_betweenness,
+    "flow_count": flow_count,
+    "node_flow_count": node_flow_count,
+    "bridges": bridges,
+    "articulation_points": articulation_points,
+    "biconnected_components": biconnected_components,
+    "redundancy_report": redundancy_report,
+}
+
+# Metrics that can be computed for a subset of nodes (see metrics --site / --type)
+NODE_METRICS = {"degree_centrality", "closeness_centrality", "average_shortest_path",
+                "betweenness_centrality", "node_flow_count", "redundancy_report"}
+
+# Training targets (see dataset.FEATURES)
+TARGETS = ["betweenness", "closeness", "degree", "flow_count", "delta_asp"]
+
+def main(argv: list[str] = None) -> None:
+    """
+        Runs one non-interactive command and writes its result as JSON.
+        Only the commands that need it import the ML stack.
+    """
+    parser = __parser()
+    args = parser.parse_args(argv)
+
+    parallel.set_workers(args.workers)
+    if args.epsilon is not None or args.time_budget is not None:
+        sampling.set_approximation(args.epsilon, time_budget=args.time_budget, min_nodes=args.approximate_above)
+    if args.distance_store:
+        distmatrix.set_store(args.distance_store)
+    if args.hierarchical:
+        hierarchy.set_hierarchical()
+
+    try:
+        # paths relative to the working directory, else to the program (see load_topology)
+        topology = os.path.abspath(args.topology) if os.path.exists(args.topology) else args.topology
+        if args.ignore_saved:
+            graph = Graph(topology)
+        else:
+            # with the changes saved from the menu, as the menu shows it
+            graph = open_graph(topology, attach=False)
+        result = args.command(graph, args)
+    except (ValueError, OSError) as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+
+    text = json.dumps(to_json(result), indent=args.indent)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+def metrics(graph: Graph, args) -> dict:
+    criteria = {field: value for field, value in (("site", args.site), ("type", args.type)) if value}
+    if criteria:
+        nodes = graph.select(**criteria)
+        if not nodes:
+            raise ValueError("No nodes match the given site and type")
+        names = [name for name in args.metric or METRICS if name in NODE_METRICS]
+        result = {name: METRICS[name](graph, nodes=nodes) for name in names}
+    else:
+        result = {name: METRICS[name](graph) for name in args.metric or METRICS}
+    if {"betweenness_centrality", "edge_betweenness", "flow_count", "node_flow_count"} & set(result):
+        result["error_bound"] = betweenness_error_bound(graph)
+    return result
+
+def spf(graph: Graph, args) -> dict:
+    from pathfinder import PathFinder
+
+    nodes = graph.get_nodes()
+    for node in (args.source, args.target):
+        if node is not None and node not in nodes:
+            raise ValueError(f"Node does not exist in current graph: {node}")
+
+    pf = PathFinder(graph)
+    if args.target is None:
+        return {"source": args.source, "distances": pf.distances(args.source)}
+    cost, path = pf.shortest_path(args.source, args.target)
+    return {"source": args.source, "target": args.target, "cost": cost, "path": path}
+
+def fib(graph: Graph, args) -> dict:
+    from fib import get_forwarding_table
+
+    nodes = graph.get_nodes()
+    for node in (args.router, args.destination):
+        if node is not None and node not in nodes:
+            raise ValueError(f"Node does not exist in current graph: {node}")
+
+    table = get_forwarding_table(graph)
+    if args.router is None:
+        return {"groups": len(table.groups), "routes": {router: table.routes(router) for router in table.csr.ids}}
+    if args.destination is None:
+        return {"router": args.router, "routes": table.routes(args.router)}
+    return {"router": args.router, "destination": args.destination,
+            "next_hops": table.next_hops(args.router, args.destination)}
+
+def contingency(graph: Graph, args) -> dict:
+    from contingency import contingency_sweep, n_minus_k
+
+    if args.k == 1:
+        failures = contingency_sweep(graph, not args.links_only, True)[:args.top]
+    else:
+        failures = n_minus_k(graph, args.k, not args.links_only, True, args.samples, args.top, seed=args.seed)
+    return {"baseline_asp": average_shortest_path(graph), "failures": failures}
+
+def train(graph: Graph, args) -> dict:
+    from dataset import generate_columns
+    from engine import Intelligence
+    from model_store import ModelStore, model_key
+
+    store = ModelStore(args.store)
+    key = model_key(graph.snapshot(), args.target, args.variants, args.seed)
+    model = None if args.retrain else store.load(key)
+    trained = model is None
+    if trained:
+        columns = generate_columns(graph, list(range(args.variants)), args.seed, parallel.get_workers())
+        model = Intelligence(columns, args.target, parallel.get_workers())
+        store.save(key, model, target=args.target, variants=args.variants, seed=args.seed)
+
+    return {
+        "target": args.target,
+        "variants": args.variants,
+        "seed": args.seed,
+        "model": key,
+        "trained": trained,
+        "r_squared": model.r_squared(),
+        "mae": model.mae(),
+        "rmse": model.rmse(),
+    }
+
+def predict(graph: Graph, args) -> dict:
+    import pandas as pd
+    from dataset import feature_columns, FEATURES
+    from model_store import ModelStore, model_key
+
+    key = model_key(graph.snapshot(), args.target, args.variants, args.seed)
+    model = ModelStore(args.store).load(key)
+    if model is None:
+        raise ValueError("No trained model for this topology and parameters; run train first")
+
+    # every feature but the target, which is what is being predicted
+    columns = feature_columns(graph, [f for f in FEATURES if f != model.target])
+    nodes = columns.pop("node")
+    preds = model.predict(pd.DataFrame(columns))
+
+    return {
+        "target": model.target,
+        "model": key,
+        "predictions": {node: float(p) for node, p in zip(nodes, preds)},
+    }
+
+def to_json(value):
+    """
+        Converts results to JSON-compatible values: dictionaries keyed by
+        links become lists of {"link": [node1, node2], "value": ...}
+        entries, sets become sorted lists, and inf / NaN become null.
+    """
+    if isinstance(value, dict):
+        if any(isinstance(key, tuple) for key in value):
+            return [{"link": list(key), "value": to_json(v)} for key, v in value.items()]
+        return {str(key): to_json(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, set):
+        return sorted(to_json(v) for v in value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def __parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="network-intelligence",
+                                     description="Network intelligence batch commands. Results are written as JSON.")
+    parser.add_argument("-t", "--topology", default="topology.json", help="JSON topology or .nisnap snapshot")
+    parser.add_argument("--ignore-saved", action="store_true",
+                        help="use the topology as it is, without changes saved from the menu")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    parser.add_argument("--indent", type=int, help="indent JSON output")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--epsilon", type=float, help="estimate betweenness and flows to within epsilon")
+    parser.add_argument("--time-budget", type=float, help="estimate betweenness and flows within this many seconds")
+    parser.add_argument("--approximate-above", type=int, default=0,
+                        help="only estimate on topologies of at least this many nodes")
+    parser.add_argument("--distance-store", help="keep all-pairs distances in memory-mapped files here")
+    parser.add_argument("--hierarchical", action="store_true",
+                        help="build all-pairs distances from per-site tables on multi-site topologies")
+    commands = parser.add_subparsers(required=True, metavar="command")
+
+    p = commands.add_parser("metrics", help="topology metrics")
+    p.add_argument("-m", "--metric", nargs="+", choices=METRICS, help="metrics to compute (default all)")
+    p.add_argument("--site", nargs="+", help="only compute per-node metrics for nodes in these sites")
+    p.add_argument("--type", nargs="+", help="only compute per-node metrics for nodes of these types")
+    p.set_defaults(command=metrics)
+
+    p = commands.add_parser("spf", help="shortest distances from a node, or the shortest path to a target")
+    p.add_argument("source")
+    p.add_argument("target", nargs="?")
+    p.set_defaults(command=spf)
+
+    p = commands.add_parser("fib", help="ECMP next hops of every router, one router, or one route")
+    p.add_argument("router", nargs="?")
+    p.add_argument("destination", nargs="?")
+    p.set_defaults(command=fib)
+
+    p = commands.add_parser("contingency", help="rank node and link failures (N-1, or N-k with -k)")
+    p.add_argument("-k", type=int, default=1, help="simultaneous failures")
+    p.add_argument("--links-only", action="store_true", help="only fail links")
+    p.add_argument("--samples", type=int, help="sample this many combinations of each size above 1")
+    p.add_argument("--top", type=int, default=50, help="worst failures to report")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(command=contingency)
+
+    p = commands.add_parser("train", help="train a prediction model on perturbed variants, or reuse a saved one")
+    __model_arguments(p)
+    p.add_argument("--retrain", action="store_true", help="train even if a saved model matches")
+    p.set_defaults(command=train)
+
+    p = commands.add_parser("predict", help="predict a target for every node with a saved model")
+    __model_arguments(p)
+    p.set_defaults(command=predict)
+
+    return parser
+
+def __model_arguments(p: argparse.ArgumentParser) -> None:
+    # models are saved by topology and these parameters (see model_store)
+    p.add_argument("target", choices=TARGETS)
+    p.add_argument("--variants", type=int, default=200)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--store", help="model directory (default models next to the program)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,222 @@
+from array import array
+from graph import Graph
+from csr import CSRGraph
+
+class Connectivity:
+    """
+        Bridges, articulation points and biconnected components of a
+        snapshot, found by one iterative Tarjan depth-first search in
+        O(V + E). Also counts the node pairs each bridge or articulation
+        point disconnects when it fails, from the sizes of the pieces it
+        splits its connected component into, so failures that partition
+        the network are known without running any shortest paths.
+    """
+    def __init__(self, csr: CSRGraph) -> None:
+        self.csr = csr
+        n = csr.node_count()
+        offsets = csr.offsets
+        neighbours = csr.neighbours
+        edge_ids = csr.edge_ids
+
+        disc = [-1] * n # discovery order
+        low = [0] * n # earliest discovery reachable from a node's DFS subtree
+        parent_edge = [-1] * n
+        subtree = [1] * n # DFS subtree sizes
+        # per node: total and sum of squares of the sizes of the
+        # subtrees only connected to the rest of the graph through it
+        pieces = [0] * n
+        pieces_sq = [0] * n
+
+        self.component = array("q", [0] * n) # connected component of each node
+        self.component_sizes: list[int] = []
+        self.bridges: dict[int, int] = {} # edge ID -> pairs disconnected
+        self.articulation_points: dict[int, int] = {} # node ID -> pairs disconnected
+        self.biconnected_components: list[list[int]] = [] # as lists of edge IDs
+        self.bcc_count = array("q", [0] * n) # biconnected components per node
+
+        time = 0
+        edge_stack = []
+
+        for root in range(n):
+            if disc[root] != -1:
+                continue
+            start = time
+            separated = [] # (bridge, child's subtree size) in this component
+            disc[root] = low[root] = time
+            time += 1
+            stack = [[root, offsets[root]]]
+
+            while stack:
+                top = stack[-1]
+                v, k = top
+                if k < offsets[v + 1]:
+                    top[1] = k + 1
+                    w, e = neighbours[k], edge_ids[k]
+                    if w == v or e == parent_edge[v]:
+                        continue
+                    if disc[w] == -1:
+                        parent_edge[w] = e
+                        disc[w] = low[w] = time
+                        time += 1
+                        edge_stack.append(e)
+                        stack.append([w, offsets[w]])
+                    elif disc[w] < disc[v]:
+                        # back edge to an ancestor
+                        low[v] = min(low[v], disc[w])
+                        edge_stack.append(e)
+                    continue
+
+                stack.pop()
+                self.component[v] = len(self.component_sizes)
+                if not stack:
+                    continue
+                u = stack[-1][0]
+                subtree[u] += subtree[v]
+                low[u] = min(low[u], low[v])
+
+                if low[v] >= disc[u]:
+                    # u separates v's subtree, whose edges back to u form a biconnected component
+                    edges = []
+                    while True:
+                        e = edge_stack.pop()
+                        edges.append(e)
+                        if e == parent_edge[v]:
+                            break
+                    self.biconnected_components.append(edges)
+                    self.__count_members(edges, u)
+                    pieces[u] += subtree[v]
+                    pieces_sq[u] += subtree[v] ** 2
+                    if low[v] > disc[u]:
+                        separated.append((parent_edge[v], subtree[v]))
+
+            size = time - start
+            self.component_sizes.append(size)
+            for e, s in separated:
+                self.bridges[e] = s * (size - s)
+
+        # Removing a node leaves its separated subtrees plus the rest of its
+        # component (nothing for a DFS root); pairs in different pieces are cut
+        for v in range(n):
+            if pieces[v]:
+                rest = self.component_sizes[self.component[v]] - 1 - pieces[v]
+                total = pieces[v] + rest
+                pairs = (total * total - pieces_sq[v] - rest * rest) // 2
+                if pairs:
+                    self.articulation_points[v] = pairs
+
+        # node pairs already unreachable from each other
+        self.unreached = (n * n - sum(size * size for size in self.component_sizes)) // 2
+
+    def __count_members(self, edges: list[int], u: int) -> None:
+        members = {u}
+        for e in edges:
+            members.update(self.csr.edge(e))
+        for v in members:
+            self.bcc_count[v] += 1
+
+    def node_unreached(self, r: int) -> int:
+        """
+            Number of unreachable pairs among the remaining nodes after
+            node r fails, as counted by FailureAnalyzer.node_outcome.
+        """
+        outside = self.csr.node_count() - self.component_sizes[self.component[r]]
+        return self.unreached - outside + self.articulation_points.get(r, 0)
+
+    def edge_unreached(self, e: int) -> int:
+        """
+            Number of unreachable pairs after edge e fails.
+        """
+        return self.unreached + self.bridges.get(e, 0)
+
+    def unreached_without(self, nodes: set[int] = (), edges: set[int] = ()) -> int:
+        """
+            Number of unreachable pairs among the remaining nodes after
+            several node IDs and edge IDs fail at once. Single failures
+            are answered from the bridges and articulation points; for
+            more, only the connected components holding a failure are
+            searched again.
+        """
+        csr = self.csr
+        nodes, edges = set(nodes), set(edges)
+        if not edges and len(nodes) == 1:
+            return self.node_unreached(next(iter(nodes)))
+        if not nodes and len(edges) == 1:
+            return self.edge_unreached(next(iter(edges)))
+
+        touched = {self.component[r] for r in nodes}
+        touched.update(self.component[csr.edges[2 * e]] for e in edges)
+        sizes_sq = sum(size * size for c, size in enumerate(self.component_sizes) if c not in touched)
+
+        offsets = csr.offsets
+        neighbours = csr.neighbours
+        edge_ids = csr.edge_ids
+        visited = bytearray(csr.node_count())
+        for r in nodes:
+            visited[r] = 1
+        for root, c in enumerate(self.component):
+            if visited[root] or c not in touched:
+                continue
+            visited[root] = 1
+            stack = [root]
+            size = 0
+            while stack:
+                v = stack.pop()
+                size += 1
+                for k in range(offsets[v], offsets[v + 1]):
+                    w = neighbours[k]
+                    if not visited[w] and edge_ids[k] not in edges:
+                        visited[w] = 1
+                        stack.append(w)
+            sizes_sq += size * size
+
+        remaining = csr.node_count() - len(nodes)
+        return (remaining * remaining - sizes_sq) // 2
+
+    def node_pairs(self, r: int) -> int:
+        """
+            Number of pairs disconnected by the failure of node r.
+        """
+        return self.articulation_points.get(r, 0)
+
+    def edge_pairs(self, e: int) -> int:
+        """
+            Number of pairs disconnected by the failure of edge e.
+        """
+        return self.bridges.get(e, 0)
+
+    def redundancy_report(self) -> dict[str, dict]:
+        """
+            Per node: whether it is an articulation point, how many of
+            its links are bridges, how many biconnected components it
+            belongs to and how many pairs its failure disconnects.
+            A node is redundant when neither its own failure nor the
+            failure of any of its links can partition the network.
+        """
+        csr = self.csr
+        incident = [0] * csr.node_count()
+        for e in self.bridges:
+            for v in csr.edge(e):
+                incident[v] += 1
+
+        report = {}
+        for v, node in enumerate(csr.ids):
+            articulation = v in self.articulation_points
+            report[node] = {
+                "articulation_point": articulation,
+                "bridges": incident[v],
+                "biconnected_components": self.bcc_count[v],
+                "disconnected_pairs": self.node_pairs(v),
+                "redundant": not articulation and not incident[v],
+            }
+        return report
+
+def get_connectivity(graph: Graph) -> Connectivity:
+    """
+        Returns the Connectivity analysis of the graph's current version.
+    """
+    csr = graph.snapshot()
+    conn = graph.cache.get("connectivity")
+    if conn is None or conn.csr is not csr:
+        conn = Connectivity(csr)
+        graph.cache["connectivity"] = conn
+    return conn
@@ -0,0 +1,176 @@
+from array import array
+from graph import Graph
+from pathfinder import PathFinder
+from parallel import get_workers
+import dense
+import distmatrix
+import hierarchy
+import sampling
+
+class MetricContext:
+    """
+        Shortest path results for one version of a graph, shared by
+        every function in metric.py.
+        All-sources Dijkstras and Brandes' each run at most once per
+        graph version; any mutation of the graph drops the context.
+    """
+    def __init__(self, graph: Graph) -> None:
+        self.graph = graph
+        self.version = graph.version
+        self.pf = PathFinder(graph)
+        self.csr = self.pf.csr
+        # "dense" or "sparse" all-pairs distances (see dense.choose_backend)
+        self.backend = dense.choose_backend(self.csr)
+        self.__distances: list[array] = None
+        self.__pair_totals: tuple = None
+        # Brandes' results and their error bounds, keyed by sampling
+        # settings (None for the exact results, see sampling)
+        self.__brandes: dict = {}
+        self.__bounds: dict = {}
+
+    def is_current(self) -> bool:
+        """
+            Returns true if the graph has not changed since
+            this context was created.
+        """
+        return self.version == self.graph.version
+
+    def distances(self) -> list[array]:
+        """
+            Returns shortest distance rows for every source,
+            indexed by node ID (see Graph.snapshot).
+            Large graphs can keep them in a memory-mapped file
+            instead (see distmatrix.set_store, not for clones), and multi-site graphs
+            can build them from per-site tables (see hierarchy.set_hierarchical).
+        """
+        if self.__distances is None:
+            if self.__stored():
+                self.__distances = distmatrix.open_matrix(self.csr)
+            elif hierarchy.use_hierarchy(self.graph):
+                self.__distances = hierarchy.get_hierarchy(self.graph).rows()
+            elif self.backend == "dense":
+                self.__distances = dense.to_rows(dense.all_pairs(self.csr))
+            else:
+                self.__distances = [array("d", self.pf.sssp(s)[0]) for s in range(self.csr.node_count())]
+        return self.__distances
+
+    def rows_for(self, sources: list[int]) -> list[array]:
+        """
+            Returns the distance rows of the given source node IDs, for
+            metrics over a subset of nodes. Only those sources are run,
+            unless all-pairs distances are already computed or are
+            cheaper to compute in one go (see dense.choose_backend).
+        """
+        if self.__distances is not None or self.backend == "dense":
+            distances = self.distances()
+            return [distances[s] for s in sources]
+        if hierarchy.use_hierarchy(self.graph):
+            sites = hierarchy.get_hierarchy(self.graph)
+            return [sites.row(self.csr.ids[s]) for s in sources]
+        return [array("d", self.pf.sssp(s)[0]) for s in sources]
+
+    def set_distances(self, rows: list[array]) -> None:
+        """
+            Uses distance rows already computed for this version of
+            the graph, e.g. kept up to date by ispf.DynamicSPF.
+        """
+        self.__distances = rows
+        self.__pair_totals = None
+
+    def pair_totals(self) -> tuple[array, array]:
+        """
+            Returns, per source s, the total finite distance and the number
+            of unreachable nodes over pairs (s, t) with t > s, so each
+            undirected pair is counted once.
+        """
+        if self.__pair_totals is None:
+            totals = array("d")
+            unreached = array("q")
+            for s, row in enumerate(self.distances()):
+                total, missing = row_pair_total(row, s)
+                totals.append(total)
+                unreached.append(missing)
+            self.__pair_totals = (totals, unreached)
+        return self.__pair_totals
+
+    def brandes(self, epsilon: float = None, time_budget: float = None) -> tuple:
+        """
+            Returns PathFinder.brandes_batch() results for the whole graph.
+            Distance rows are collected during the same pass if they
+            have not been computed yet and would come from sparse
+            Dijkstras anyway (see distances), so the backend doesn't
+            depend on which metric runs first. Runs
+            on parallel.get_workers() processes.
+            Results are estimated from a sample of sources when epsilon or
+            time_budget is given, or for large graphs when approximation
+            is turned on (see sampling.set_approximation).
+        """
+        settings = sampling.get_approximation(self.csr.node_count(), epsilon, time_budget)
+        if settings not in self.__brandes:
+            if settings is None:
+                collect = self.__distances is None and self.__sparse_rows()
+                rows = [] if collect else None
+                self.__brandes[None] = self.pf.brandes_batch(rows, get_workers())
+                self.__bounds[None] = None
+                if rows is not None:
+                    self.__distances = rows
+            else:
+                self.__brandes[settings], self.__bounds[settings] = sampling.sampled_brandes(
+                    self.pf, *settings, workers=get_workers())
+        return self.__brandes[settings]
+
+    def __sparse_rows(self) -> bool:
+        """
+            Returns true if distances() would run sparse Dijkstras.
+        """
+        return (self.backend == "sparse" and not self.__stored()
+                and not hierarchy.use_hierarchy(self.graph))
+
+    def __stored(self) -> bool:
+        """
+            Returns true if distances are kept on disk (see distmatrix.set_store).
+            Throwaway copies, such as training variants, keep them in memory.
+        """
+        return not self.graph.transient and distmatrix.use_store(self.csr)
+
+    def brandes_bound(self, epsilon: float = None, time_budget: float = None) -> dict:
+        """
+            Returns the error bound of brandes() results with the same
+            arguments (see sampling.bound_report), or None if they are exact.
+        """
+        self.brandes(epsilon, time_budget)
+        return self.__bounds[sampling.get_approximation(self.csr.node_count(), epsilon, time_budget)]
+
+def row_pair_total(row: array, s: int, skip: int = -1) -> tuple[float, int]:
+    """
+        Sums a distance row over targets t > s (ignoring node ID skip).
+        Returns the finite distance total and the number of unreachable targets.
+    """
+    tail = row[s + 1:]
+    if 0 <= skip - s - 1 < len(tail):
+        del tail[skip - s - 1]
+
+    unreached = tail.count(float("inf"))
+    if unreached:
+        return sum(d for d in tail if d != float("inf")), unreached
+    return sum(tail), 0
+
+def average_pair_distance(total: float, unreached: int, pair_count: int) -> float:
+    """
+        Average shortest path over pair_count node pairs.
+        Any unreachable pair makes the average infinite.
+    """
+    if pair_count <= 0:
+        return 0.0
+    return float("inf") if unreached else total / pair_count
+
+def get_context(graph: Graph) -> MetricContext:
+    """
+        Returns the shared MetricContext for the graph's current
+        version, creating it if the graph has changed.
+    """
+    ctx = graph.cache.get("metrics")
+    if ctx is None or not ctx.is_current():
+        ctx = MetricContext(graph)
+        graph.cache["metrics"] = ctx
+    return ctx
@@ -0,0 +1,313 @@
+import heapq
+import itertools
+import math
+import random as rand
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from graph import Graph
+from context import average_pair_distance
+from failure import FailureAnalyzer, get_failure_analyzer
+from connectivity import Connectivity, get_connectivity
+from parallel import get_workers
+
+# Failures evaluated per pool task
+CHUNK_SIZE = 16
+
+# Chunks queued per worker while streaming N-k results
+QUEUED_CHUNKS = 4
+
+# Failure analyzer held by each pool worker, sent once by the pool initializer,
+# with the failure elements, affected source masks and connectivity of an N-k analysis
+__worker_analyzer: FailureAnalyzer = None
+__worker_elements: list[tuple] = None
+__worker_masks: list[int] = None
+__worker_conn: Connectivity = None
+
+def contingency_sweep(graph: Graph, nodes: bool = True, links: bool = True, workers: int = None) -> list[dict]:
+    """
+        N-1 contingency analysis: evaluates every single node and link
+        failure against one shared baseline (see failure.FailureAnalyzer).
+        Returns one row per failure, ranked worst first, with the failed
+        element, the new average shortest path, its ratio to the baseline
+        (impact) and the number of node pairs the failure disconnected.
+        Failures that leave pairs unreachable are known from the graph's
+        bridges and articulation points (see connectivity.Connectivity)
+        and get their rows without running any shortest paths; only the
+        rest are split across workers processes (default parallel.get_workers()).
+    """
+    analyzer = get_failure_analyzer(graph)
+    conn = get_connectivity(graph)
+    csr = analyzer.csr
+
+    failures = []
+    rows = []
+    if nodes:
+        for r, node in enumerate(csr.ids):
+            if conn.node_unreached(r):
+                rows.append(__partition_row(analyzer, "node", node, conn.node_pairs(r)))
+            else:
+                failures.append(("node", node))
+    if links:
+        for e in range(csr.edge_count()):
+            if csr.edges[2 * e] == csr.edges[2 * e + 1]:
+                continue
+            if conn.edge_unreached(e):
+                rows.append(__partition_row(analyzer, "link", csr.edge_key(e), conn.edge_pairs(e)))
+            else:
+                failures.append(("link", csr.edge_key(e)))
+
+    workers = get_workers() if workers is None else workers
+    chunks = [failures[i:i + CHUNK_SIZE] for i in range(0, len(failures), CHUNK_SIZE)]
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                 initializer=__init_worker, initargs=(analyzer,)) as pool:
+            for chunk_rows in pool.map(__evaluate_chunk, chunks):
+                rows.extend(chunk_rows)
+    else:
+        for chunk in chunks:
+            rows.extend(evaluate_failures(analyzer, chunk))
+
+    return rank_failures(rows)
+
+def evaluate_failures(analyzer: FailureAnalyzer, failures: list[tuple]) -> list[dict]:
+    """
+        Evaluates ("node", name) and ("link", (node1, node2)) failures.
+    """
+    rows = []
+    for kind, element in failures:
+        if kind == "node":
+            total, unreached, pair_count = analyzer.node_outcome(element)
+            disconnected = analyzer.disconnected_pairs(unreached, [element])
+        else:
+            total, unreached, pair_count = analyzer.edge_outcome(*element)
+            disconnected = analyzer.disconnected_pairs(unreached)
+
+        asp = average_pair_distance(total, unreached, pair_count)
+        rows.append({
+            "type": kind,
+            "element": element,
+            "asp": asp,
+            "impact": asp / analyzer.baseline,
+            "disconnected_pairs": disconnected,
+        })
+    return rows
+
+def __partition_row(analyzer: FailureAnalyzer, kind: str, element, disconnected: int) -> dict:
+    """
+        Row for a failure that leaves some pairs unreachable,
+        so its average shortest path is infinite.
+    """
+    asp = float("inf")
+    return {
+        "type": kind,
+        "element": element,
+        "asp": asp,
+        "impact": asp / analyzer.baseline,
+        "disconnected_pairs": disconnected,
+    }
+
+def rank_failures(rows: list[dict]) -> list[dict]:
+    """
+        Orders failures worst first: by disconnected pairs, then new
+        average shortest path (the same order as impact, which is
+        undefined when the baseline is already disconnected).
+        The sort is stable, so ties keep node-then-link input order.
+    """
+    return sorted(rows, key=__rank_key, reverse=True)
+
+def n_minus_k(graph: Graph, k: int = 2, nodes: bool = False, links: bool = True, samples: int = None,
+              top: int = 10, workers: int = None, seed: int = 0) -> list[dict]:
+    """
+        N-k contingency analysis (see iter_n_minus_k).
+        Returns the top worst combinations of failures.
+    """
+    worst = []
+    for _, _, worst in iter_n_minus_k(graph, k, nodes, links, samples, top, workers, seed):
+        pass
+    return worst
+
+def iter_n_minus_k(graph: Graph, k: int = 2, nodes: bool = False, links: bool = True, samples: int = None,
+                   top: int = 10, workers: int = None, seed: int = 0):
+    """
+        N-k contingency analysis: evaluates combinations of up to k
+        simultaneous node and/or link failures. Every combination is
+        enumerated, or with samples set, every single failure plus that
+        many random combinations of each larger size.
+        Link combinations that no shortest path tree uses are skipped,
+        since they leave every shortest path as it is. For the rest, the
+        pairs a combination disconnects are counted from the connected
+        components left after it (see connectivity.Connectivity), which
+        bounds how it can rank: once the top list is full, combinations
+        that cannot beat its last entry are dropped, and those that
+        partition the network need no shortest paths at all. Only the
+        remaining ones are rerun, for the sources whose trees use one of
+        their elements.
+        Runs on workers processes (default parallel.get_workers()) and yields
+        a tuple of combinations done, combinations in total, and the top
+        worst so far (ranked as in rank_failures) after each chunk.
+        Rows hold the failures as a list of (type, element) tuples.
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    analyzer = get_failure_analyzer(graph)
+    conn = get_connectivity(graph)
+    csr = analyzer.csr
+
+    elements = []
+    if nodes:
+        elements += [("node", node) for node in csr.ids]
+    if links:
+        elements += [("link", csr.edge_key(e)) for e in range(csr.edge_count())
+                     if csr.edges[2 * e] != csr.edges[2 * e + 1]]
+    masks = [analyzer.affected_sources(**{"node" if kind == "node" else "edge": element})
+             for kind, element in elements]
+
+    k = min(k, len(elements))
+    if samples is None:
+        total = sum(math.comb(len(elements), size) for size in range(1, k + 1))
+    else:
+        total = len(elements) + sum(min(samples, math.comb(len(elements), size)) for size in range(2, k + 1))
+    combinations = __combinations(len(elements), k, samples, seed)
+
+    workers = get_workers() if workers is None else workers
+    done = 0
+    worst = []
+
+    def chunks():
+        # yields (combinations skipped before the chunk, chunk), so that
+        # skipped ones are counted as done along with the chunk's results
+        skipped = 0
+        chunk = []
+        for combination in combinations:
+            if all(elements[i][0] == "link" for i in combination) and not any(masks[i] for i in combination):
+                skipped += 1
+                continue
+            chunk.append(combination)
+            if len(chunk) == CHUNK_SIZE:
+                yield skipped, chunk
+                skipped = 0
+                chunk = []
+        if chunk or skipped:
+            yield skipped, chunk
+
+    def threshold():
+        # the key a combination must beat to enter the top list
+        return __rank_key(worst[-1]) if len(worst) >= top else None
+
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=__init_worker,
+                                   initargs=(analyzer, elements, masks, conn))
+        results = __stream(pool, chunks(), workers * QUEUED_CHUNKS, threshold)
+    else:
+        pool = None
+        results = ((skipped + len(chunk), evaluate_combinations(analyzer, elements, masks, chunk, conn, threshold()))
+                   for skipped, chunk in chunks())
+
+    try:
+        for count, rows in results:
+            done += count
+            worst = heapq.nlargest(top, worst + rows, key=__rank_key)
+            yield done, total, worst
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+def evaluate_combinations(analyzer: FailureAnalyzer, elements: list[tuple], masks: list[int],
+                          combinations: list[tuple], conn: Connectivity = None, threshold: tuple = None) -> list[dict]:
+    """
+        Evaluates combinations of failures, given as tuples of
+        indexes into elements, with each element's affected source mask.
+        With the graph's Connectivity, combinations that leave pairs
+        unreachable get their rows without running any shortest paths.
+        With a threshold rank key as well, combinations that cannot rank
+        above it (see rank_failures) are left out of the result.
+    """
+    csr = analyzer.csr
+    rows = []
+    for combination in combinations:
+        failed_nodes = [elements[i][1] for i in combination if elements[i][0] == "node"]
+        failed_links = [elements[i][1] for i in combination if elements[i][0] == "link"]
+        affected = 0
+        for i in combination:
+            affected |= masks[i]
+
+        asp = None
+        if conn is not None:
+            removed = {csr.index[node] for node in failed_nodes}
+            edge_ids = {csr.edge_ids[csr.slot(csr.index[u], csr.index[v])] for u, v in failed_links}
+            unreached = conn.unreached_without(removed, edge_ids)
+            disconnected = analyzer.disconnected_pairs(unreached, failed_nodes)
+            # Ranked by disconnected pairs, then average shortest path, which
+            # nothing beats once the threshold's is infinite; ties keep the
+            # earlier row, so a combination only counts if it ranks higher
+            if threshold is not None and (disconnected < threshold[0] or (
+                    disconnected == threshold[0] and threshold[1] == float("inf"))):
+                continue
+            if unreached:
+                asp = float("inf")
+
+        if asp is None:
+            total, unreached, pair_count = analyzer.combination_outcome(failed_nodes, failed_links, affected)
+            asp = average_pair_distance(total, unreached, pair_count)
+            disconnected = analyzer.disconnected_pairs(unreached, failed_nodes)
+
+        rows.append({
+            "failures": [elements[i] for i in combination],
+            "asp": asp,
+            "impact": asp / analyzer.baseline,
+            "disconnected_pairs": disconnected,
+        })
+    return rows
+
+def __combinations(count: int, k: int, samples: int, seed: int):
+    """
+        Yields index combinations of sizes 1 to k: all of them, or every
+        single index plus up to samples random combinations of each larger size.
+    """
+    for size in range(1, k + 1):
+        if samples is None or size == 1 or math.comb(count, size) <= samples:
+            yield from itertools.combinations(range(count), size)
+            continue
+        rng = rand.Random(f"{seed}:{size}")
+        seen = set()
+        while len(seen) < samples:
+            combination = tuple(sorted(rng.sample(range(count), size)))
+            if combination not in seen:
+                seen.add(combination)
+                yield combination
+
+def __stream(pool: ProcessPoolExecutor, chunks, queued: int, threshold):
+    """
+        Yields (combinations done, rows) per chunk in order, keeping at
+        most queued chunks submitted at a time so combinations are
+        generated as needed. Each chunk is sent with the threshold()
+        rank key current when it is submitted.
+    """
+    futures = deque()
+    for skipped, chunk in chunks:
+        futures.append((skipped + len(chunk), pool.submit(__evaluate_combination_chunk, chunk, threshold())))
+        if len(futures) >= queued:
+            count, future = futures.popleft()
+            yield count, future.result()
+    while futures:
+        count, future = futures.popleft()
+        yield count, future.result()
+
+def __rank_key(row: dict) -> tuple:
+    return row["disconnected_pairs"], row["asp"]
+
+def __init_worker(analyzer: FailureAnalyzer, elements: list[tuple] = None, masks: list[int] = None,
+                  conn: Connectivity = None) -> None:
+    global __worker_analyzer, __worker_elements, __worker_masks, __worker_conn
+    __worker_analyzer = analyzer
+    __worker_elements = elements
+    __worker_masks = masks
+    __worker_conn = conn
+
+def __evaluate_chunk(failures: list[tuple]) -> list[dict]:
+    return evaluate_failures(__worker_analyzer, failures)
+
+def __evaluate_combination_chunk(combinations: list[tuple], threshold: tuple) -> list[dict]:
+    return evaluate_combinations(__worker_analyzer, __worker_elements, __worker_masks, combinations,
+                                 __worker_conn, threshold)
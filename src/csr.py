@@ -0,0 +1,169 @@
+import hashlib
+from array import array
+
+class CSRGraph:
+    """
+        Frozen, integer-indexed snapshot of a Graph.
+        Node IDs are interned to integers 0..n-1 (in graph insertion order)
+        and adjacency is stored in compressed sparse row (CSR) form:
+        the neighbours of node i live in neighbours[offsets[i]:offsets[i+1]],
+        with matching costs in weights and undirected edge IDs in edge_ids.
+    """
+    __slots__ = ("ids", "index", "offsets", "neighbours", "weights", "edge_ids", "edges")
+
+    def __init__(self, ids: list[str], offsets: array, neighbours: array,
+                 weights: array, edge_ids: array, edges: array,
+                 index: dict[str, int] = None) -> None:
+        self.ids = ids
+        self.index = index if index is not None else {node: i for i, node in enumerate(ids)}
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.weights = weights
+        self.edge_ids = edge_ids
+        # undirected edge ID e -> node indices (edges[2e], edges[2e+1]), ordered
+        # the same way as the repo's (u, v) if u < v else (v, u) edge keys
+        self.edges = edges
+
+    @classmethod
+    def from_vertices(cls, vertices: dict[str, dict[str, float]]) -> "CSRGraph":
+        """
+            Builds a snapshot from a Graph's adjacency dictionary.
+            Edge IDs are assigned in first-seen order while scanning
+            nodes and their neighbours, matching the key order of the
+            dictionaries returned by PathFinder.brandes.
+        """
+        ids = list(vertices)
+        index = {node: i for i, node in enumerate(ids)}
+
+        offsets = array("q", [0])
+        neighbours = array("q")
+        weights = array("d")
+        edge_ids = array("q")
+        edges = array("q")
+        edge_index: dict[tuple[str, str], int] = {}
+
+        for u in ids:
+            for v, w in vertices[u].items():
+                e = (u, v) if u < v else (v, u)
+                eid = edge_index.get(e)
+                if eid is None:
+                    eid = len(edge_index)
+                    edge_index[e] = eid
+                    edges.append(index[e[0]])
+                    edges.append(index[e[1]])
+                neighbours.append(index[v])
+                weights.append(w)
+                edge_ids.append(eid)
+            offsets.append(len(neighbours))
+
+        return cls(ids, offsets, neighbours, weights, edge_ids, edges)
+
+    def arrays(self) -> tuple[array, array, array, array, array]:
+        """
+            Returns the offsets, neighbours, weights, edge_ids and edges
+            sections as arrays, copying any that are views of a
+            memory-mapped snapshot file.
+        """
+        sections = []
+        for typecode, section in (("q", self.offsets), ("q", self.neighbours), ("d", self.weights),
+                                  ("q", self.edge_ids), ("q", self.edges)):
+            if not isinstance(section, array):
+                copy = array(typecode)
+                copy.frombytes(section.cast("B"))
+                section = copy
+            sections.append(section)
+        return tuple(sections)
+
+    def __reduce__(self) -> tuple:
+        """
+            Pickles the snapshot as plain arrays (see arrays).
+        """
+        return CSRGraph, (self.ids, *self.arrays())
+
+    def fingerprint(self) -> bytes:
+        """
+            Hashes the node names and adjacency of the snapshot, so results
+            computed for the same topology can be found again after a restart.
+        """
+        h = hashlib.sha256()
+        h.update("\0".join(self.ids).encode("utf-8"))
+        for section in (self.offsets, self.neighbours, self.weights):
+            h.update(section)
+        return h.digest()
+
+    def node_count(self) -> int:
+        return len(self.ids)
+
+    def edge_count(self) -> int:
+        return len(self.edges) // 2
+
+    def edge(self, eid: int) -> tuple[int, int]:
+        """
+            Returns the (u, v) node IDs of an edge ID.
+        """
+        return self.edges[2 * eid], self.edges[2 * eid + 1]
+
+    def edge_key(self, eid: int) -> tuple[str, str]:
+        """
+            Returns the (u, v) node name tuple for an edge ID.
+        """
+        return self.ids[self.edges[2 * eid]], self.ids[self.edges[2 * eid + 1]]
+
+    def slot(self, u: int, v: int) -> int:
+        """
+            Returns the position of v in u's neighbour list,
+            or -1 if u and v are not connected.
+        """
+        for k in range(self.offsets[u], self.offsets[u + 1]):
+            if self.neighbours[k] == v:
+                return k
+        return -1
+
+    def without(self, node: int = -1, edge: int = -1, nodes=(), edges=()) -> "CSRGraph":
+        """
+            Returns a copy of the snapshot with a node's links and/or
+            an edge removed, for simulating failures. Several nodes and
+            edges can be removed at once by passing them as nodes and edges.
+            Node and edge IDs are kept, so results stay aligned with this
+            snapshot; a removed node is left in place with no links.
+        """
+        offsets = self.offsets
+        neighbours = self.neighbours
+        weights = self.weights
+        edge_ids = self.edge_ids
+
+        removed_nodes = set(nodes)
+        removed_edges = set(edges)
+        if node >= 0:
+            removed_nodes.add(node)
+        if edge >= 0:
+            removed_edges.add(edge)
+
+        # only the adjacency rows of the failed elements' endpoints change
+        touched = set(removed_nodes)
+        for r in removed_nodes:
+            touched.update(neighbours[offsets[r]:offsets[r + 1]])
+        for e in removed_edges:
+            touched.update(self.edge(e))
+
+        new_offsets = array("q", [0])
+        new_neighbours = array("q")
+        new_weights = array("d")
+        new_edge_ids = array("q")
+
+        for i in range(len(self.ids)):
+            start, end = offsets[i], offsets[i + 1]
+            if i not in touched:
+                new_neighbours.extend(neighbours[start:end])
+                new_weights.extend(weights[start:end])
+                new_edge_ids.extend(edge_ids[start:end])
+            elif i not in removed_nodes:
+                for k in range(start, end):
+                    if neighbours[k] not in removed_nodes and edge_ids[k] not in removed_edges:
+                        new_neighbours.append(neighbours[k])
+                        new_weights.append(weights[k])
+                        new_edge_ids.append(edge_ids[k])
+            new_offsets.append(len(new_neighbours))
+
+        return CSRGraph(self.ids, new_offsets, new_neighbours, new_weights,
+                        new_edge_ids, self.edges, self.index)
@@ -0,0 +1,139 @@
+import random as rand
+from concurrent.futures import ProcessPoolExecutor
+from graph import Graph
+from metric import *
+import parallel
+import sampling
+
+# Base graph held by each pool worker, sent once by the pool initializer
+__worker_graph: Graph = None
+
+def variant_rng(seed: int, stage: str, variant: int) -> rand.Random:
+    """
+        Returns the random generator for one stage of one variant.
+        Seeded from the base seed only, so every variant is reproducible
+        no matter which worker (or how many workers) generate it.
+    """
+    return rand.Random(f"{seed}:{stage}:{variant}")
+
+def split_variants(sample_size: int) -> tuple[list[int], list[int]]:
+    """
+        Splits variant indexes into train and test sets.
+    """
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(
+    list(range(sample_size)),
+    test_size=0.2,
+    random_state=42
+    )
+
+def make_variant(graph: Graph, seed: int, variant: int) -> Graph:
+    """
+        Clones the graph and perturbs its weights with the variant's seed.
+    """
+    g = graph.clone()
+    perturb_weights_once(g, variant_rng(seed, "variant", variant))
+    return g
+
+# Feature columns of a training table, in model column order
+FEATURES = ["degree", "closeness", "betweenness", "flow_count", "delta_asp"]
+
+def gen_columns(graph: Graph, rng: rand.Random = rand) -> dict:
+    """
+        Perturbs the graph's weights and computes the features
+        of every node (see feature_columns).
+    """
+    perturb_weights_once(graph, rng)
+    return feature_columns(graph)
+
+def feature_columns(graph: Graph, features: list[str] = FEATURES) -> dict:
+    """
+        Computes features of every node of a graph as it is, written
+        straight into one NumPy array per feature, in graph node order.
+        Returns a dictionary of the arrays, plus the node names under "node".
+    """
+    import numpy as np
+
+    nodes = list(graph.get_nodes())
+    n = len(nodes)
+    metrics = {
+        "degree": degree_centrality,
+        "closeness": closeness_centrality,
+        "betweenness": betweenness_centrality,
+        "flow_count": node_flow_count,
+        "delta_asp": lambda g: {node: failure_impact_score(g, node)[1] for node in nodes},
+    }
+
+    columns = {"node": nodes}
+    for feature in features:
+        result = metrics[feature](graph)
+        columns[feature] = np.fromiter((result[node] for node in nodes), dtype=np.float64, count=n)
+    return columns
+
+# models congestion on edges
+def perturb_weights_once(g: Graph, rng: rand.Random = rand, low=0.8, high=1.2) -> None:
+    seen = set()
+    for u in g.get_nodes():
+        for v, w in g.get_edges(u).items():
+            e = (u, v) if u < v else (v, u)
+            if e in seen:
+                continue
+            seen.add(e)
+
+            factor = rng.uniform(low, high)
+            new_w = w * factor
+
+            # update both directions (undirected)
+            g.set_weight(u, v, new_w)
+
+def generate_columns(graph: Graph, variants: list[int], seed: int, workers: int = 1) -> dict:
+    """
+        Generates the training table for the given variant indexes, as
+        a dictionary of column arrays preallocated for every row
+        (variant_id, node, then FEATURES). Variant i of the list becomes
+        variant_id i.
+        With workers > 1 variants are computed in a process pool; they
+        are always written in variant order, so the output only
+        depends on the graph, variants and seed.
+    """
+    import numpy as np
+
+    tasks = list(enumerate(variants))
+    n = len(graph.get_nodes())
+    size = n * len(tasks)
+    table = {"variant_id": np.empty(size, dtype=np.int64), "node": np.empty(size, dtype=object)}
+    for feature in FEATURES:
+        table[feature] = np.empty(size, dtype=np.float64)
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 initializer=__init_worker, initargs=(graph, sampling.get_settings())) as pool:
+            for id, columns in enumerate(pool.map(__variant_columns, [(seed,) + t for t in tasks])):
+                __write_variant(table, id, n, columns)
+    else:
+        for id, variant in tasks:
+            __write_variant(table, id, n, __gen_variant_columns(graph, seed, variant))
+
+    return table
+
+def __write_variant(table: dict, id: int, n: int, columns: dict) -> None:
+    rows = slice(id * n, (id + 1) * n)
+    table["variant_id"][rows] = id
+    for name, values in columns.items():
+        table[name][rows] = values
+
+def __gen_variant_columns(graph: Graph, seed: int, variant: int) -> dict:
+    g = make_variant(graph, seed, variant)
+    return gen_columns(g, variant_rng(seed, "rows", variant))
+
+def __init_worker(graph: Graph, approximation: tuple) -> None:
+    global __worker_graph
+    __worker_graph = graph
+    # variants already run in parallel; keep each worker's metrics serial
+    parallel.set_workers(1)
+    sampling.set_approximation(*approximation)
+
+def __variant_columns(task: tuple) -> dict:
+    seed, id, variant = task
+    return __gen_variant_columns(__worker_graph, seed, variant)
@@ -0,0 +1,74 @@
+import importlib.util
+from array import array
+from csr import CSRGraph
+
+# Optional: metrics fall back to per-source Dijkstras without NumPy.
+# It is only imported once a dense matrix is built, to keep startup fast.
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# Dense matrices are n x n, so they are only used up to this many nodes
+DENSE_MAX_NODES = 1024
+
+# Measured cost of one interpreted Dijkstras step relative to one
+# vectorised matrix element update
+DENSE_SPEEDUP = 100
+
+def choose_backend(csr: CSRGraph) -> str:
+    """
+        Picks the all-pairs backend for a snapshot: "dense" (vectorised
+        Floyd-Warshall over a weight matrix) or "sparse" (Dijkstras
+        from every source).
+        Dense is used for small or well-connected graphs with positive
+        costs, when NumPy is available.
+    """
+    n = csr.node_count()
+    m = csr.edge_count()
+    if not HAVE_NUMPY or n < 2 or n > DENSE_MAX_NODES:
+        return "sparse"
+    if any(w <= 0 for w in csr.weights):
+        return "sparse"
+
+    # Rough cost model: n^3 vectorised operations against n Dijkstras of
+    # O(m + n log n) interpreted steps, each costing ~DENSE_SPEEDUP times more
+    return "dense" if n * n <= DENSE_SPEEDUP * (m + n * n.bit_length()) else "sparse"
+
+def weight_matrix(csr: CSRGraph):
+    """
+        Builds the dense n x n cost matrix of a snapshot:
+        0 on the diagonal, inf where nodes are not linked.
+    """
+    import numpy as np
+
+    n = csr.node_count()
+    W = np.full((n, n), np.inf)
+    rows = np.repeat(np.arange(n), np.diff(np.frombuffer(csr.offsets, dtype=np.int64)))
+    cols = np.frombuffer(csr.neighbours, dtype=np.int64)
+    W[rows, cols] = np.frombuffer(csr.weights, dtype=np.float64)
+    np.fill_diagonal(W, 0.0)
+    return W
+
+def all_pairs(csr: CSRGraph):
+    """
+        Vectorised Floyd-Warshall over the weight matrix.
+        Returns the n x n distance matrix. Costs must be positive.
+    """
+    import numpy as np
+
+    D = weight_matrix(csr)
+    for k in range(len(D)):
+        np.minimum(D, D[:, k, None] + D[None, k, :], out=D)
+    return D
+
+def to_rows(matrix) -> list[array]:
+    """
+        Converts a matrix to per-source rows in the same array
+        form as the sparse backend.
+    """
+    import numpy as np
+
+    rows = []
+    for i in range(len(matrix)):
+        row = array("d")
+        row.frombytes(np.ascontiguousarray(matrix[i], dtype=np.float64).tobytes())
+        rows.append(row)
+    return rows
@@ -0,0 +1,209 @@
+import mmap
+import os
+import struct
+import time
+from array import array
+from csr import CSRGraph
+from pathfinder import PathFinder
+
+# All-pairs distance file (little-endian):
+#   header  magic, value typecode ("d" float64 or "f" float32), node count n,
+#           rows written so far, and the fingerprint of the graph it belongs to
+#   rows    n rows of n distances, row s holding the distances from node ID s
+MAGIC = b"NIDIST"
+HEADER = struct.Struct("<6s1sxQQ32s")
+HEADER_SIZE = 64
+
+MATRIX_EXTENSION = ".nidist"
+
+# Rows computed between flushes of the progress counter in the header
+FLUSH_ROWS = 256
+
+# Eviction policy (see set_store): files unused for MAX_AGE_DAYS are
+# deleted, then the least recently used beyond MAX_MATRICES
+MAX_MATRICES = 4
+MAX_AGE_DAYS = 7
+
+# Disk-backed distances (see set_store); off by default
+__directory: str = None
+__min_nodes: int = 10000
+__typecode: str = "d"
+__max_matrices: int = MAX_MATRICES
+__max_age: float = MAX_AGE_DAYS * 86400
+
+def set_store(directory: str, min_nodes: int = 10000, typecode: str = "d",
+              max_matrices: int = MAX_MATRICES, max_age_days: float = MAX_AGE_DAYS) -> None:
+    """
+        Keeps all-pairs distances for graphs of at least min_nodes nodes
+        in memory-mapped files in directory, instead of as rows in memory.
+        typecode "f" stores float32 to halve the file size.
+        Every graph version has its own file, so opening one deletes
+        files unused for max_age_days, then the least recently used
+        beyond max_matrices (see evict).
+        None turns disk-backed distances off.
+    """
+    global __directory, __min_nodes, __typecode, __max_matrices, __max_age
+    if typecode not in ("d", "f"):
+        raise ValueError("Distance typecode must be 'd' or 'f'")
+    if max_matrices < 1:
+        raise ValueError("Matrix count must be at least 1")
+    __directory = directory
+    __min_nodes = min_nodes
+    __typecode = typecode
+    __max_matrices = max_matrices
+    __max_age = max_age_days * 86400
+
+def use_store(csr: CSRGraph) -> bool:
+    """
+        Returns true if the snapshot's distances should be kept on disk.
+    """
+    return __directory is not None and csr.node_count() >= __min_nodes
+
+class DistanceMatrix:
+    """
+        All-pairs shortest distances in a memory-mapped file, indexed by
+        node ID (see Graph.snapshot). Rows are written as they are computed
+        and read back on demand, so only one row is held in memory at a time.
+        Indexing or iterating gives rows as arrays, like MetricContext.distances().
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "r+b") as f:
+            self.__buf = mmap.mmap(f.fileno(), 0)
+        magic, typecode, n, rows, digest = HEADER.unpack_from(self.__buf)
+        if magic != MAGIC or typecode not in (b"d", b"f"):
+            raise ValueError("Not a distance matrix file")
+
+        self.typecode = typecode.decode()
+        self.n = n
+        self.rows = rows # rows computed so far
+        self.digest = digest
+        self.__itemsize = array(self.typecode).itemsize
+        if len(self.__buf) != HEADER_SIZE + n * n * self.__itemsize:
+            raise ValueError("Corrupt distance matrix file")
+
+    @classmethod
+    def create(cls, path: str, n: int, digest: bytes, typecode: str = "d") -> "DistanceMatrix":
+        """
+            Creates an empty matrix file for n nodes.
+        """
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, typecode.encode(), n, 0, digest).ljust(HEADER_SIZE, b"\0"))
+            f.truncate(HEADER_SIZE + n * n * array(typecode).itemsize)
+        return cls(path)
+
+    def __reduce__(self) -> tuple:
+        """
+            Pickles the matrix as its file path, so worker
+            processes map the same file.
+        """
+        return DistanceMatrix, (self.path,)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, s: int) -> array:
+        if not 0 <= s < self.rows:
+            raise IndexError("Distance row not computed")
+        start = HEADER_SIZE + s * self.n * self.__itemsize
+        row = array(self.typecode)
+        row.frombytes(self.__buf[start:start + self.n * self.__itemsize])
+        return row if self.typecode == "d" else array("d", row)
+
+    def __iter__(self):
+        for s in range(self.rows):
+            yield self[s]
+
+    def distance(self, s: int, t: int) -> float:
+        """
+            Reads a single distance without loading its row.
+        """
+        if not 0 <= s < self.rows or not 0 <= t < self.n:
+            raise IndexError("Distance not computed")
+        return struct.unpack_from("<" + self.typecode, self.__buf,
+                                  HEADER_SIZE + (s * self.n + t) * self.__itemsize)[0]
+
+    def complete(self) -> bool:
+        return self.rows == self.n
+
+    def fill(self, pf: PathFinder) -> None:
+        """
+            Computes the remaining rows with Dijkstras, writing each to the
+            file as it is found. Progress is saved every FLUSH_ROWS rows, so
+            an interrupted run carries on where it stopped.
+        """
+        size = self.n * self.__itemsize
+        while self.rows < self.n:
+            s = self.rows
+            start = HEADER_SIZE + s * size
+            self.__buf[start:start + size] = array(self.typecode, pf.sssp(s)[0]).tobytes()
+            self.rows += 1
+            if self.rows % FLUSH_ROWS == 0 or self.rows == self.n:
+                self.__save_progress()
+
+    def close(self) -> None:
+        self.__buf.close()
+
+    def __save_progress(self) -> None:
+        # data first, so the counter never covers rows that are not on disk
+        self.__buf.flush()
+        HEADER.pack_into(self.__buf, 0, MAGIC, self.typecode.encode(), self.n, self.rows, self.digest)
+        self.__buf.flush(0, min(mmap.PAGESIZE, len(self.__buf)))
+
+def open_matrix(csr: CSRGraph, directory: str = None, typecode: str = None) -> DistanceMatrix:
+    """
+        Returns the complete distance matrix for a snapshot, reusing the
+        file for the same topology if one exists and computing any
+        rows it is missing. Defaults to the directory and typecode from set_store.
+        Other files in the directory are evicted first (see evict), so a
+        new file only takes the place of one unused for longest.
+    """
+    directory = directory or __directory
+    typecode = typecode or __typecode
+    digest = csr.fingerprint()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, digest.hex()[:32] + typecode + MATRIX_EXTENSION)
+    if os.path.exists(path):
+        os.utime(path) # last used
+    __evict(directory, path)
+
+    matrix = None
+    if os.path.exists(path):
+        try:
+            matrix = DistanceMatrix(path)
+            if matrix.digest != digest or matrix.n != csr.node_count():
+                matrix.close()
+                matrix = None
+        except ValueError:
+            matrix = None
+    if matrix is None:
+        matrix = DistanceMatrix.create(path, csr.node_count(), digest, typecode)
+
+    matrix.fill(PathFinder(csr))
+    return matrix
+
+def evict(directory: str = None) -> list[str]:
+    """
+        Applies the eviction policy from set_store to the distance files
+        in directory now. Returns the paths of the deleted files.
+    """
+    return __evict(directory or __directory, None)
+
+def __evict(directory: str, keep: str) -> list[str]:
+    # keep is the file being opened, which takes one of the places
+    now = time.time()
+    files = [entry for entry in os.scandir(directory)
+             if entry.name.endswith(MATRIX_EXTENSION) and entry.path != keep]
+    files.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    places = __max_matrices - (keep is not None)
+
+    evicted = []
+    for i, entry in enumerate(files):
+        if i < places and now - entry.stat().st_mtime <= __max_age:
+            continue
+        try:
+            os.remove(entry.path)
+        except OSError:
+            continue # still mapped by another process (on Windows)
+        evicted.append(entry.path)
+    return evicted
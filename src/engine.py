@@ -1,13 +1,23 @@
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import pandas as pd
 import numpy as np
 import math
 
+# Rows predicted per batch, bounding the memory of large prediction sets
+PREDICT_BATCH = 100000
+
 class Intelligence:
-    def __init__(self, rows: list[dict], target: str) -> None:
+    def __init__(self, rows: dict | list[dict], target: str, n_jobs: int = 1) -> None:
+        """
+            Trains the model on a table of column arrays (see
+            dataset.generate_columns) or a list of row dictionaries,
+            with n_jobs cores building the forest (-1 for all cores).
+        """
         self.rows = rows
+        self.target = target
+        self.n_jobs = n_jobs
         self.__df = self.__conv_to_dataframe()
 
         self.__X = self.__df.drop(columns=[target]) # X = features
@@ -17,10 +27,40 @@ class Intelligence:
         self.__X = self.__encode_categoricals() if self.__cats else self.__X
         self.__X = self.__df.drop(columns=[target] + [c for c in self.__cats if c in self.__df.columns])
 
+        self.features = list(self.__X.columns) # model input columns, in order
+
         self.__X_train, self.__X_test, self.__y_train, self.__y_test = self.__train_test_split()
 
         self.__model = self.__fit_model_with_train()
+        # Test set predictions, computed once and shared by every score,
+        # and the scores by name
+        self.__y_pred: np.ndarray = None
+        self.__scores: dict = None
     
+    def __getstate__(self) -> dict:
+        """
+            Pickles only what a saved model is used for (see model_store):
+            the fitted forest, its feature columns and its test scores.
+            The training data is left out.
+        """
+        return {
+            "target": self.target,
+            "n_jobs": self.n_jobs,
+            "features": self.features,
+            "model": self.__model,
+            "scores": self.__test_scores(),
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.rows = None
+        self.__df = None
+        self.target = state["target"]
+        self.n_jobs = state["n_jobs"]
+        self.features = state["features"]
+        self.__model = state["model"]
+        self.__y_pred = None
+        self.__scores = state["scores"]
+
     def __conv_to_dataframe(self) -> pd.DataFrame:
         return pd.DataFrame(self.rows)
     
@@ -31,7 +71,8 @@ class Intelligence:
         return train_test_split(self.__X, self.__y, test_size=test_size, random_state=random_state)
     
     def __fit_model_with_train(self) -> RandomForestRegressor:
-        model = RandomForestRegressor(random_state=42)
+        # the fitted forest is the same for any number of jobs
+        model = RandomForestRegressor(random_state=42, n_jobs=self.n_jobs)
         model.fit(self.__X_train, self.__y_train)
         return model
 
@@ -45,24 +86,49 @@ class Intelligence:
         """
             Calculates variance of a feature
         """
-        return self.__model.score(self.__X_test, self.__y_test)
+        return self.__test_scores()["r_squared"]
 
     def mae(self) -> float:
         """
             Average error of prediction compared to real values
         """
-        y_pred = self.__model.predict(self.__X_test)
-        return mean_absolute_error(self.__y_test, y_pred)
+        return self.__test_scores()["mae"]
 
     def rmse(self) -> float:
         """
             Error of worst prediction
         """
-        y_pred = self.__model.predict(self.__X_test)
-        return math.sqrt(mean_squared_error(self.__y_test, y_pred))
+        return self.__test_scores()["rmse"]
+
+    def __test_scores(self) -> dict:
+        if self.__scores is None:
+            if self.__y_pred is None:
+                self.__y_pred = self.predict(self.__X_test)
+            self.__scores = {
+                "r_squared": r2_score(self.__y_test, self.__y_pred),
+                "mae": mean_absolute_error(self.__y_test, self.__y_pred),
+                "rmse": math.sqrt(mean_squared_error(self.__y_test, self.__y_pred)),
+            }
+        return self.__scores
 
     def save(self) -> None:
+        """
+            Writes the training dataset to a CSV file. Models loaded
+            from a ModelStore don't keep their dataset.
+        """
+        if self.__df is None:
+            raise ValueError("Saved models do not keep their training dataset")
         self.__df.to_csv("simulation_dataset.csv", index=False)
 
-    def predict(self, X: list[list[float]]) -> np.ndarray:
-        return self.__model.predict(X)
\ No newline at end of file
+    def predict(self, X: list[list[float]], batch_size: int = PREDICT_BATCH) -> np.ndarray:
+        """
+            Predicts the target for each row of X, batch_size rows at a time.
+            Columns of a DataFrame are put in the model's feature order.
+        """
+        if hasattr(X, "columns"):
+            X = X[self.features]
+        if len(X) <= batch_size:
+            return self.__model.predict(X)
+        rows = X.iloc if hasattr(X, "iloc") else X
+        return np.concatenate([self.__model.predict(rows[i:i + batch_size])
+                               for i in range(0, len(X), batch_size)])
\ No newline at end of file
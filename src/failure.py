@@ -0,0 +1,244 @@
+from array import array
+from graph import Graph
+from pathfinder import PathFinder
+from context import MetricContext, get_context, row_pair_total, average_pair_distance
+
+class FailureAnalyzer:
+    """
+        Incremental what-if engine for node and edge failures.
+        Keeps the baseline distance rows of every source, which encode
+        each source's shortest path tree, and reruns Dijkstras only for
+        sources whose trees use the failed node or edge.
+    """
+    def __init__(self, ctx: MetricContext) -> None:
+        self.csr = ctx.csr
+        self.distances = ctx.distances()
+        self.totals, self.unreached = ctx.pair_totals()
+
+        n = self.csr.node_count()
+        self.baseline = average_pair_distance(sum(self.totals), sum(self.unreached), n * (n - 1) // 2)
+
+    def node_failure(self, node: str) -> tuple:
+        """
+            Average shortest path after removing a node.
+            Returns a tuple of the new average shortest path
+            and its ratio to the baseline.
+        """
+        return self.__result(*self.node_outcome(node))
+
+    def node_outcome(self, node: str) -> tuple:
+        """
+            Pair totals after removing a node. Returns a tuple of the
+            total finite distance, the number of unreachable pairs and
+            the number of pairs among the remaining nodes.
+        """
+        csr = self.csr
+        r = csr.index[node]
+        n = csr.node_count()
+        affected = []
+        total = 0.0
+        unreached = 0
+
+        for s, row in enumerate(self.distances):
+            if s == r:
+                continue
+            if self.__uses_node(row, r):
+                affected.append(s)
+                continue
+
+            # Tree avoids r: only the pair (s, r) disappears
+            total += self.totals[s]
+            unreached += self.unreached[s]
+            if r > s:
+                if row[r] == float("inf"):
+                    unreached -= 1
+                else:
+                    total -= row[r]
+
+        pf = PathFinder(csr.without(node=r))
+        for s in affected:
+            t, u = row_pair_total(pf.sssp(s)[0], s, skip=r)
+            total += t
+            unreached += u
+
+        return total, unreached, (n - 1) * (n - 2) // 2
+
+    def edge_failure(self, node1: str, node2: str) -> tuple:
+        """
+            Average shortest path after removing the edge (node1, node2).
+            Returns a tuple of the new average shortest path
+            and its ratio to the baseline.
+        """
+        return self.__result(*self.edge_outcome(node1, node2))
+
+    def edge_outcome(self, node1: str, node2: str) -> tuple:
+        """
+            Pair totals after removing the edge (node1, node2), as
+            returned by node_outcome.
+        """
+        csr = self.csr
+        a, b = csr.index[node1], csr.index[node2]
+        k = csr.slot(a, b)
+        if k < 0:
+            raise ValueError("Edge does not exist in current graph")
+        weight = csr.weights[k]
+        n = csr.node_count()
+        affected = []
+        total = 0.0
+        unreached = 0
+
+        for s, row in enumerate(self.distances):
+            da, db = row[a], row[b]
+            # Tree uses the edge if it lies on a shortest path in either direction
+            if da != float("inf") and (on_shortest_path(da, weight, db) or on_shortest_path(db, weight, da)):
+                affected.append(s)
+                continue
+            total += self.totals[s]
+            unreached += self.unreached[s]
+
+        pf = PathFinder(csr.without(edge=csr.edge_ids[k]))
+        for s in affected:
+            t, u = row_pair_total(pf.sssp(s)[0], s)
+            total += t
+            unreached += u
+
+        return total, unreached, n * (n - 1) // 2
+
+    def __uses_node(self, row: array, r: int) -> bool:
+        """
+            Returns true if node r is a predecessor of another node
+            on a shortest path in the tree the distance row came from.
+        """
+        csr = self.csr
+        dist_r = row[r]
+        if dist_r == float("inf"):
+            return False
+        for k in range(csr.offsets[r], csr.offsets[r + 1]):
+            if on_shortest_path(dist_r, csr.weights[k], row[csr.neighbours[k]]):
+                return True
+        return False
+
+    def combination_outcome(self, nodes: list[str] = (), edges: list[tuple] = (), affected: int = None) -> tuple:
+        """
+            Pair totals after removing several nodes and edges at once,
+            as returned by node_outcome. Only sources whose trees use any
+            of them are rerun; affected can pass that set in, as a bitmask
+            of source node IDs (see affected_sources).
+        """
+        csr = self.csr
+        removed = {csr.index[node] for node in nodes}
+        edge_ids = []
+        for node1, node2 in edges:
+            k = csr.slot(csr.index[node1], csr.index[node2])
+            if k < 0:
+                raise ValueError("Edge does not exist in current graph")
+            edge_ids.append(csr.edge_ids[k])
+
+        if affected is None:
+            affected = 0
+            for node in nodes:
+                affected |= self.affected_sources(node=node)
+            for edge in edges:
+                affected |= self.affected_sources(edge=edge)
+
+        n = csr.node_count()
+        remaining = n - len(removed)
+        rerun = []
+        total = 0.0
+        unreached = 0
+
+        for s in range(n):
+            if s in removed:
+                continue
+            if affected >> s & 1:
+                rerun.append(s)
+                continue
+
+            # Tree avoids every failure: only pairs with removed nodes disappear
+            row = self.distances[s] if removed else None
+            total += self.totals[s]
+            unreached += self.unreached[s]
+            for r in removed:
+                if r > s:
+                    if row[r] == float("inf"):
+                        unreached -= 1
+                    else:
+                        total -= row[r]
+
+        if rerun:
+            pf = PathFinder(csr.without(nodes=removed, edges=edge_ids))
+            for s in rerun:
+                t, u = row_pair_total(pf.sssp(s)[0], s)
+                # removed nodes are left unreachable; they are not pairs any more
+                total += t
+                unreached += u - sum(1 for r in removed if r > s)
+
+        return total, unreached, remaining * (remaining - 1) // 2
+
+    def affected_sources(self, node: str = None, edge: tuple = None) -> int:
+        """
+            Returns the sources whose shortest path trees use a node
+            (other than as the source) or an edge, as a bitmask of
+            source node IDs.
+        """
+        csr = self.csr
+        mask = 0
+        if node is not None:
+            r = csr.index[node]
+            for s, row in enumerate(self.distances):
+                if s != r and self.__uses_node(row, r):
+                    mask |= 1 << s
+        if edge is not None:
+            a, b = csr.index[edge[0]], csr.index[edge[1]]
+            k = csr.slot(a, b)
+            if k < 0:
+                raise ValueError("Edge does not exist in current graph")
+            weight = csr.weights[k]
+            for s, row in enumerate(self.distances):
+                da, db = row[a], row[b]
+                if da != float("inf") and (on_shortest_path(da, weight, db) or on_shortest_path(db, weight, da)):
+                    mask |= 1 << s
+        return mask
+
+    def disconnected_pairs(self, unreached: int, nodes: list[str] = ()) -> int:
+        """
+            Number of pairs a failure disconnected, given the unreachable
+            pair count from node_outcome, edge_outcome or combination_outcome
+            and the nodes that failed.
+            Pairs that were unreachable before the failure are not counted.
+        """
+        csr = self.csr
+        removed = [csr.index[node] for node in nodes]
+        before = sum(self.unreached)
+        # pairs with a removed node no longer exist
+        for i, r in enumerate(removed):
+            row = self.distances[r]
+            before -= row.count(float("inf"))
+            # pairs of two removed nodes were subtracted twice
+            before += sum(1 for r2 in removed[:i] if row[r2] == float("inf"))
+        return unreached - before
+
+    def __result(self, total: float, unreached: int, pair_count: int) -> tuple:
+        new_avg_shortest_path = average_pair_distance(total, unreached, pair_count)
+        return new_avg_shortest_path, new_avg_shortest_path/self.baseline
+
+def on_shortest_path(dist_u: float, weight: float, dist_v: float) -> bool:
+    """
+        Returns true if the link u -> v (of the given cost) lies on a
+        shortest path, given the source's distances to u and v.
+        Allows for rounding, since distances may come from Floyd-Warshall
+        rather than Dijkstras; a false positive only costs an extra rerun.
+    """
+    return dist_u + weight - dist_v <= 1e-9 * max(dist_v, 1.0)
+
+def get_failure_analyzer(graph: Graph) -> FailureAnalyzer:
+    """
+        Returns the FailureAnalyzer for the graph's current version,
+        sharing baseline shortest paths with the metric context.
+    """
+    ctx = get_context(graph)
+    analyzer = graph.cache.get("failures")
+    if analyzer is None or analyzer.csr is not ctx.csr:
+        analyzer = FailureAnalyzer(ctx)
+        graph.cache["failures"] = analyzer
+    return analyzer
@@ -0,0 +1,139 @@
+from array import array
+from graph import Graph
+from csr import CSRGraph
+from pathfinder import PathFinder
+from parallel import get_workers, map_next_hops
+
+# Destinations per SPF batch (and pool task)
+CHUNK_SIZE = 64
+
+class ForwardingTable:
+    """
+        ECMP forwarding tables (FIBs) of every node, as OSPF would
+        install them: the set of equal-cost next hops from each router
+        to each destination.
+        One SPF is run per destination; on an undirected graph the
+        predecessors of a router in the destination's tree are exactly
+        its next hops towards that destination.
+        Next-hop sets are interned as groups, shared by every entry
+        that uses them, and the tables are a single n x n array of
+        group IDs (row per router, column per destination).
+        Group 0 is the empty set, used for a router's own entry and
+        for unreachable destinations.
+    """
+    def __init__(self, csr: CSRGraph, workers: int = None) -> None:
+        self.csr = csr
+        n = csr.node_count()
+        self.groups: list[tuple[int, ...]] = [()] # group ID -> next hop node IDs
+        self.__group_ids: dict[tuple[int, ...], int] = {(): 0}
+        self.table = array("i", bytes(4 * n * n))
+
+        workers = get_workers() if workers is None else workers
+        chunks = [range(d, min(d + CHUNK_SIZE, n)) for d in range(0, n, CHUNK_SIZE)]
+
+        if workers > 1 and len(chunks) > 1:
+            columns = map_next_hops(csr, chunks, workers)
+        else:
+            pf = PathFinder(csr)
+            columns = (pf.next_hop_columns(destinations) for destinations in chunks)
+        for destinations, chunk in zip(chunks, columns):
+            self.__fill(destinations, chunk)
+
+    def __fill(self, destinations: range, columns: list[list]) -> None:
+        n = self.csr.node_count()
+        table = self.table
+        group_ids = self.__group_ids
+        for d, column in zip(destinations, columns):
+            for v, hops in enumerate(column):
+                if hops:
+                    gid = group_ids.get(hops)
+                    if gid is None:
+                        gid = len(self.groups)
+                        group_ids[hops] = gid
+                        self.groups.append(hops)
+                    table[v * n + d] = gid
+
+    def group(self, router: int, destination: int) -> int:
+        """
+            Returns the next-hop group ID of a router's route to a
+            destination, by node ID.
+        """
+        return self.table[router * self.csr.node_count() + destination]
+
+    def next_hops(self, router: str, destination: str) -> list[str]:
+        """
+            Returns the ECMP next hops from router towards destination,
+            empty if the destination is the router itself or unreachable.
+        """
+        index = self.csr.index
+        ids = self.csr.ids
+        return [ids[v] for v in self.groups[self.group(index[router], index[destination])]]
+
+    def routes(self, router: str) -> dict[str, list[str]]:
+        """
+            Returns the router's whole forwarding table as a dictionary
+            of destination -> next hops, leaving out empty entries.
+        """
+        ids = self.csr.ids
+        n = self.csr.node_count()
+        start = self.csr.index[router] * n
+        routes = {}
+        for d, gid in enumerate(self.table[start:start + n]):
+            if gid:
+                routes[ids[d]] = [ids[v] for v in self.groups[gid]]
+        return routes
+
+def fib_diff(old: ForwardingTable, new: ForwardingTable) -> dict[str, dict[str, tuple]]:
+    """
+        Compares the forwarding tables of two graph versions.
+        Returns router -> destination -> (old next hops, new next hops)
+        for every entry that changed. Nodes only present in one version
+        are compared against empty entries.
+    """
+    changes = {}
+
+    if old.csr.ids == new.csr.ids:
+        # Same nodes: map new group IDs onto the old ones and only
+        # look at the entries of rows that differ
+        n = old.csr.node_count()
+        ids = old.csr.ids
+        old_ids = {tuple(ids[v] for v in hops): gid for gid, hops in enumerate(old.groups)}
+        translate = [old_ids.get(tuple(ids[v] for v in hops), -1) for hops in new.groups]
+
+        for router in range(n):
+            start = router * n
+            old_row = old.table[start:start + n]
+            new_row = array("i", [translate[gid] for gid in new.table[start:start + n]])
+            if old_row == new_row:
+                continue
+            for d in range(n):
+                if old_row[d] != new_row[d]:
+                    entry = old.next_hops(ids[router], ids[d]), new.next_hops(ids[router], ids[d])
+                    changes.setdefault(ids[router], {})[ids[d]] = entry
+        return changes
+
+    nodes = list(dict.fromkeys(old.csr.ids + new.csr.ids))
+    for router in nodes:
+        for destination in nodes:
+            entry = __lookup(old, router, destination), __lookup(new, router, destination)
+            if entry[0] != entry[1]:
+                changes.setdefault(router, {})[destination] = entry
+    return changes
+
+def get_forwarding_table(graph: Graph) -> ForwardingTable:
+    """
+        Returns the ForwardingTable of the graph's current version,
+        building it on parallel.get_workers() processes if needed.
+    """
+    csr = graph.snapshot()
+    fib = graph.cache.get("fib")
+    if fib is None or fib.csr is not csr:
+        fib = ForwardingTable(csr)
+        graph.cache["fib"] = fib
+    return fib
+
+def __lookup(fib: ForwardingTable, router: str, destination: str) -> list[str]:
+    index = fib.csr.index
+    if router not in index or destination not in index:
+        return []
+    return fib.next_hops(router, destination)
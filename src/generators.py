@@ -0,0 +1,171 @@
+import argparse
+import json
+import math
+import random as rand
+
+# Synthetic topologies in the same node/link schema as topology.json,
+# used to see how the path finding and metrics scale (see benchmark.py)
+
+def ring_of_sites(sites: int, nodes_per_site: int, seed: int = 0) -> dict:
+    """
+        WAN of sites joined in a ring. Each site has two core routers
+        (linked to the matching core routers of the next site) and
+        dual-homed L3 switches.
+    """
+    r = rand.Random(seed)
+    nodes, links = [], []
+
+    for s in range(sites):
+        site = f"Site{s}"
+        nodes.append({"id": f"{site}-R0", "type": "router", "site": site})
+        nodes.append({"id": f"{site}-R1", "type": "router", "site": site})
+        links.append(__link(f"{site}-R0", f"{site}-R1", r.randint(1, 5)))
+
+        for i in range(max(nodes_per_site - 2, 0)):
+            switch = f"{site}-SW{i}"
+            nodes.append({"id": switch, "type": "L3-switch", "site": site})
+            links.append(__link(switch, f"{site}-R0", r.randint(1, 5)))
+            links.append(__link(switch, f"{site}-R1", r.randint(1, 5)))
+
+    if sites > 1:
+        for s in range(sites if sites > 2 else 1):
+            t = (s + 1) % sites
+            links.append(__link(f"Site{s}-R0", f"Site{t}-R0", r.randint(10, 50)))
+            links.append(__link(f"Site{s}-R1", f"Site{t}-R1", r.randint(10, 50)))
+
+    return {"nodes": nodes, "links": links}
+
+def hub_and_spoke(spokes: int, nodes_per_spoke: int, hubs: int = 2, seed: int = 0) -> dict:
+    """
+        Fully meshed hub routers, with each spoke site's router
+        linked to every hub and its switches hanging off that router.
+    """
+    r = rand.Random(seed)
+    nodes, links = [], []
+
+    for h in range(hubs):
+        nodes.append({"id": f"Hub-R{h}", "type": "router", "site": "Hub"})
+        for g in range(h):
+            links.append(__link(f"Hub-R{g}", f"Hub-R{h}", r.randint(1, 5)))
+
+    for s in range(spokes):
+        site = f"Spoke{s}"
+        router = f"{site}-R0"
+        nodes.append({"id": router, "type": "router", "site": site})
+        for h in range(hubs):
+            links.append(__link(router, f"Hub-R{h}", r.randint(10, 50)))
+
+        for i in range(max(nodes_per_spoke - 1, 0)):
+            switch = f"{site}-SW{i}"
+            nodes.append({"id": switch, "type": "L3-switch", "site": site})
+            links.append(__link(switch, router, r.randint(1, 5)))
+
+    return {"nodes": nodes, "links": links}
+
+def fat_tree(k: int, seed: int = 0) -> dict:
+    """
+        k-ary fat-tree (k even): (k/2)^2 core switches and k pods of
+        k/2 aggregation and k/2 edge switches, 5k^2/4 nodes in total.
+    """
+    if k < 2 or k % 2:
+        raise ValueError("Fat-tree arity must be an even number >= 2")
+    r = rand.Random(seed)
+    half = k // 2
+    nodes, links = [], []
+
+    for c in range(half * half):
+        nodes.append({"id": f"Core{c}", "type": "router", "site": "Core"})
+
+    for p in range(k):
+        site = f"Pod{p}"
+        for a in range(half):
+            agg = f"{site}-Agg{a}"
+            nodes.append({"id": agg, "type": "L3-switch", "site": site})
+            for c in range(half):
+                links.append(__link(agg, f"Core{a * half + c}", r.randint(1, 5)))
+        for e in range(half):
+            edge = f"{site}-Edge{e}"
+            nodes.append({"id": edge, "type": "switch", "site": site})
+            for a in range(half):
+                links.append(__link(edge, f"{site}-Agg{a}", r.randint(1, 5)))
+
+    return {"nodes": nodes, "links": links}
+
+def leaf_spine(spines: int, leaves: int, seed: int = 0) -> dict:
+    """
+        Two-tier Clos fabric: every leaf switch links to every spine.
+    """
+    r = rand.Random(seed)
+    nodes, links = [], []
+
+    for s in range(spines):
+        nodes.append({"id": f"Spine{s}", "type": "router", "site": "Spine"})
+    for l in range(leaves):
+        leaf = f"Leaf{l}"
+        nodes.append({"id": leaf, "type": "L3-switch", "site": f"Rack{l}"})
+        for s in range(spines):
+            links.append(__link(leaf, f"Spine{s}", r.randint(1, 5)))
+
+    return {"nodes": nodes, "links": links}
+
+def scale_free(n: int, attach: int = 2, seed: int = 0) -> dict:
+    """
+        Barabasi-Albert preferential attachment graph: each new node
+        links to `attach` existing nodes chosen in proportion to degree.
+    """
+    r = rand.Random(seed)
+    attach = max(1, min(attach, n - 1))
+    nodes = [{"id": f"N{i}", "type": "router", "site": f"Site{i % max(1, n // 50)}"} for i in range(n)]
+    links = []
+
+    # every endpoint of every link, so sampling from it is degree-weighted
+    endpoints = list(range(attach))
+    for i in range(attach, n):
+        targets = set()
+        while len(targets) < attach:
+            targets.add(r.choice(endpoints))
+        for t in targets:
+            links.append(__link(f"N{i}", f"N{t}", r.randint(1, 20)))
+            endpoints += [i, t]
+
+    return {"nodes": nodes, "links": links}
+
+GENERATORS = ["ring", "hub", "fattree", "leafspine", "scalefree"]
+
+def generate(kind: str, nodes: int, seed: int = 0) -> dict:
+    """
+        Generates a topology of the given kind with roughly `nodes` nodes.
+    """
+    match kind:
+        case "ring":
+            return ring_of_sites(max(3, nodes // 10), 10, seed)
+        case "hub":
+            return hub_and_spoke(max(1, (nodes - 2) // 10), 10, seed=seed)
+        case "fattree":
+            k = max(2, 2 * round(math.sqrt(nodes * 4 / 5) / 2))
+            return fat_tree(k, seed)
+        case "leafspine":
+            spines = max(2, round(math.sqrt(nodes) / 4))
+            return leaf_spine(spines, max(1, nodes - spines), seed)
+        case "scalefree":
+            return scale_free(nodes, 2, seed)
+        case _:
+            raise ValueError(f"Unknown topology kind: {kind}")
+
+def __link(source: str, target: str, cost: int) -> dict:
+    return {"source": source, "target": target, "cost": cost}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic topology JSON")
+    parser.add_argument("kind", choices=GENERATORS)
+    parser.add_argument("nodes", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="-")
+    args = parser.parse_args()
+
+    topology = generate(args.kind, args.nodes, args.seed)
+    if args.output == "-":
+        print(json.dumps(topology))
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(topology, f)
@@ -1,14 +1,49 @@
-from load_topology import extract_topology
+from load_topology import extract_topology, resource_path
+from csr import CSRGraph
+from attributes import NodeAttributes
+from snapshot import save_snapshot, load_snapshot, read_attributes, SNAPSHOT_EXTENSION
 import json
 
 class Graph:
-    def __init__(self, topology: str = "topology.json") -> None:
+    def __init__(self, topology: str | dict = "topology.json") -> None:
         """
             Initialise a graph from a loaded JSON stored topology
             Automatically builds from JSON.
+            Also accepts an already loaded topology dictionary
+            (same nodes/links schema).
         """
-        self.topology: dict[str, list[dict[str, str]]] = extract_topology(topology)
-        self.vertices: dict[str, dict[str, float]] = {}
+        self.__vertices: dict[str, dict[str, float]] = {}
+        # Attributes of each node ("type", "site" and any extra fields)
+        self.attributes = NodeAttributes()
+        # Snapshot the adjacency dictionary is built from on first use
+        # (graphs loaded from a binary snapshot), otherwise None
+        self.__base: CSRGraph = None
+        # Copy-on-write state after clone(): while shared, the adjacency
+        # rows may also belong to other graphs and only those in owned have
+        # been copied for this graph to modify (owned is None until the
+        # adjacency dictionary itself has been copied)
+        self.__shared = False
+        self.__owned: set[str] = None
+        self.__shared_attributes = False
+        # Bumped on every mutation; derived data (snapshots, shortest path
+        # results) lives in cache and is dropped whenever the graph changes
+        self.version: int = 0
+        self.cache: dict = {}
+        # Journal that every mutation is appended to (see journal.open_graph)
+        self.journal = None
+        # Throwaway copies (see clone) never keep results on disk
+        self.transient = False
+
+        if isinstance(topology, str) and topology.endswith(SNAPSHOT_EXTENSION):
+            self.topology = None
+            path = resource_path(topology)
+            self.__build_from_snapshot(load_snapshot(path), read_attributes(path))
+            return
+
+        if isinstance(topology, dict):
+            self.topology: dict[str, list[dict[str, str]]] = topology
+        else:
+            self.topology: dict[str, list[dict[str, str]]] = extract_topology(topology)
         self.__build_graph()
     
     def __build_graph(self) -> None:
@@ -24,18 +59,114 @@ class Graph:
             nodeID = node["id"]
             nodeType = node["type"]
             nodeSite = node["site"]
-            self.add_node(nodeID, nodeType, nodeSite)
+            extra = {field: value for field, value in node.items() if field not in ("id", "type", "site")}
+            self.add_node(nodeID, nodeType, nodeSite, extra or None)
 
         # Appends all links to corresponding node (undirected graph joins links both ways)
         for link in links:
             self.add_edge(link["source"], link["target"], float(link["cost"]))
     
-    def add_node(self, nodeID: str, type: str, site: str) -> None:
+    def __build_from_snapshot(self, csr: CSRGraph, attributes: dict[str, list]) -> None:
+        """
+            Loads the topology from a binary snapshot without replaying
+            add_node/add_edge for every link.
+            The memory-mapped snapshot is used directly by the path finding
+            and metrics; the adjacency dictionary is only built when needed.
+        """
+        self.__vertices = None
+        self.__base = csr
+        self.cache["snapshot"] = csr
+        self.attributes = NodeAttributes.from_columns(csr.ids, attributes)
+
+    @property
+    def vertices(self) -> dict[str, dict[str, float]]:
+        if self.__vertices is None:
+            csr = self.__base
+            ids = csr.ids
+            offsets = csr.offsets
+            names = list(map(ids.__getitem__, csr.neighbours))
+            weights = csr.weights.tolist()
+
+            self.__vertices = {
+                node: dict(zip(names[offsets[i]:offsets[i + 1]], weights[offsets[i]:offsets[i + 1]]))
+                for i, node in enumerate(ids)
+            }
+            self.__base = None
+            self.__shared = False
+        return self.__vertices
+
+    @vertices.setter
+    def vertices(self, vertices: dict[str, dict[str, float]]) -> None:
+        self.__vertices = vertices
+        self.__base = None
+        self.__shared = False
+
+    def __writable(self, *nodes: str) -> dict[str, dict[str, float]]:
+        """
+            Returns the adjacency dictionary for modification, first
+            copying it and the given nodes' rows if they are shared
+            with clones (other rows stay shared).
+        """
+        vertices = self.vertices
+        if not self.__shared:
+            return vertices
+        if self.__owned is None:
+            vertices = self.__vertices = vertices.copy()
+            self.__owned = set()
+        for node in nodes:
+            if node not in self.__owned and node in vertices:
+                vertices[node] = vertices[node].copy()
+                self.__owned.add(node)
+        return vertices
+
+    def __writable_attributes(self) -> NodeAttributes:
+        if self.__shared_attributes:
+            self.attributes = self.attributes.copy()
+            self.__shared_attributes = False
+        return self.attributes
+
+    def save_snapshot(self, path: str) -> None:
+        """
+            Saves the current topology as a binary snapshot
+            (see snapshot.py), which loads faster than JSON.
+        """
+        save_snapshot(self.snapshot(), path, attributes=self.attribute_columns())
+
+    def attribute_columns(self) -> dict[str, list]:
+        """
+            Returns node attributes as one list per field, in node order
+            (None where a node doesn't have the field), for saving with
+            a snapshot.
+        """
+        return self.attributes.columns(self.snapshot().ids)
+
+    def add_node(self, nodeID: str, type: str, site: str, fields: dict = None) -> None:
         """
             Adding a node to the current topology.
+            Extra attributes can be given as a dictionary of fields.
         """
-        self.vertices[nodeID] = {}
-        # Add persistence here...
+        self.__writable()[nodeID] = {}
+        if self.__shared:
+            self.__owned.add(nodeID)
+        self.__writable_attributes().add(nodeID, {"type": type, "site": site, **(fields or {})})
+        self.__changed()
+        if fields:
+            self.__record("add_node", nodeID, type, site, fields)
+        else:
+            self.__record("add_node", nodeID, type, site)
+
+    def set_attribute(self, node: str, field: str, value) -> None:
+        """
+            Sets an attribute of a node (None removes it).
+            A node's site decides its place in the site hierarchy,
+            so changing it counts as a topology change.
+        """
+        if node not in self.vertices:
+            raise ValueError("Node does not exist")
+        self.__writable_attributes().set(node, field, value)
+        if field == "site":
+            self.__changed()
+        self.__record("set_attribute", node, field, value)
 
     def add_edge(self, node1: str, node2: str, weight: float) -> None:
         """
@@ -45,8 +176,23 @@ class Graph:
             raise ValueError("One or both nodes are not in the graph")
         if node2 in self.vertices[node1]:
             raise ValueError("Nodes are already connected")
-        self.vertices[node1][node2] = weight
-        self.vertices[node2][node1] = weight
+        vertices = self.__writable(node1, node2)
+        vertices[node1][node2] = weight
+        vertices[node2][node1] = weight
+        self.__changed()
+        self.__record("add_edge", node1, node2, weight)
+
+    def set_weight(self, node1: str, node2: str, weight: float) -> None:
+        """
+            Updates the cost of an existing undirected edge.
+        """
+        if node1 not in self.vertices or node2 not in self.vertices[node1]:
+            raise ValueError("Edge does not exist")
+        vertices = self.__writable(node1, node2)
+        vertices[node1][node2] = weight
+        vertices[node2][node1] = weight
+        self.__changed()
+        self.__record("set_weight", node1, node2, weight)
 
     # for simulating failures in graph links
     def remove_node(self, node: str) -> None:
@@ -55,18 +201,41 @@ class Graph:
         """
         if node not in self.vertices:
             raise ValueError("Node does not exist")
-        for node2 in self.vertices:
-            if node2 in self.vertices[node]:
-                self.remove_edge(node, node2)
+        neighbours = list(self.vertices[node])
+        vertices = self.__writable(*neighbours)
+        for node2 in neighbours:
+            del vertices[node2][node]
         
-        del self.vertices[node]
+        del vertices[node]
+        if self.__shared:
+            self.__owned.discard(node)
+        self.__writable_attributes().remove(node)
+        self.__changed()
+        self.__record("remove_node", node)
     
     def remove_edge(self, node1: str, node2: str) -> None:
         """
             Removes undirected edge from graph.
         """
-        del self.vertices[node1][node2]
-        del self.vertices[node2][node1]
+        vertices = self.__writable(node1, node2)
+        del vertices[node1][node2]
+        del vertices[node2][node1]
+        self.__changed()
+        self.__record("remove_edge", node1, node2)
+
+    def __changed(self) -> None:
+        """
+            Marks the topology as modified, invalidating cached results.
+        """
+        self.version += 1
+        self.cache.clear()
+
+    def __record(self, op: str, *args) -> None:
+        """
+            Appends a mutation to the journal, if one is attached.
+        """
+        if self.journal is not None:
+            self.journal.append(op, *args)
         
     def get_nodes(self) -> dict[str, dict[str, float]]:
         """
@@ -82,6 +251,37 @@ class Graph:
         """
         return self.vertices[node]
 
+    def get_site(self, node: str) -> str | None:
+        """
+            Returns the site a node belongs to, or None if unknown.
+        """
+        return self.attributes.value(node, "site")
+
+    def get_attributes(self, node: str) -> dict:
+        """
+            Returns a dictionary of a node's attributes.
+        """
+        return self.attributes.get(node)
+
+    def select(self, **criteria) -> list[str]:
+        """
+            Returns the nodes whose attributes match every criterion, e.g.
+            select(site="London", type="router"); a criterion can also be
+            a list of accepted values (see attributes.NodeAttributes.select).
+        """
+        return self.attributes.select(**criteria)
+
+    def snapshot(self) -> CSRGraph:
+        """
+            Returns a frozen, integer-indexed CSR snapshot of the
+            current topology for the shortest path algorithms.
+            Built on demand and reused until the graph is modified.
+        """
+        if "snapshot" not in self.cache and self.__base is not None:
+            self.cache["snapshot"] = self.__base
+        if "snapshot" not in self.cache:
+            self.cache["snapshot"] = CSRGraph.from_vertices(self.vertices)
+        return self.cache["snapshot"]
 
     def display_graph(self) -> None:
         """
@@ -91,13 +291,43 @@ class Graph:
         for node in self.vertices:
             print(f"{node} -> {self.vertices[node]}")
 
+    def __getstate__(self) -> dict:
+        """
+            Pickles the topology without cached results or journal,
+            e.g. when sending a graph to worker processes.
+        """
+        state = self.__dict__.copy()
+        state["cache"] = {}
+        state["journal"] = None
+        # the unpickled copy shares nothing
+        state["_Graph__shared"] = False
+        state["_Graph__owned"] = None
+        state["_Graph__shared_attributes"] = False
+        return state
+
     def clone(self) -> object:
+        """
+            Returns an independent copy of the graph in O(1): the copy
+            shares the adjacency dictionary, node attributes and current
+            snapshot with this graph, and whichever graph is modified
+            first copies the dictionary and just the rows it changes.
+        """
         g = Graph.__new__(Graph)  # bypass __init__ (so it doesn't load JSON)
 
-        g.vertices = {u: nbrs.copy() for u, nbrs in self.vertices.items()}
+        for graph in (self, g):
+            graph.__shared = True
+            graph.__owned = None
+            graph.__shared_attributes = True
+
+        g.__vertices = self.__vertices
+        g.__base = self.__base
+        g.version = self.version
+        # snapshots are immutable, so the current one can be shared
+        g.cache = {"snapshot": self.cache["snapshot"]} if "snapshot" in self.cache else {}
+        g.journal = None  # what-if copies are never persisted
+        g.transient = True
 
-        if hasattr(self, "nodes"):
-            g.nodes = {k: v.copy() if isinstance(v, dict) else v for k, v in self.nodes.items()}
+        g.attributes = self.attributes
 
         return g
 
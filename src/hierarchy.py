@@ -0,0 +1,188 @@
+import weakref
+from array import array
+from graph import Graph
+from csr import CSRGraph
+from pathfinder import PathFinder
+
+# Hierarchical all-pairs distances for the metrics (see set_hierarchical); off by default
+__enabled: bool = False
+__min_sites: int = 2
+
+# Each graph's hierarchy, kept across versions so that a change
+# only rebuilds the tables of the sites it touched
+__hierarchies = weakref.WeakKeyDictionary()
+
+def set_hierarchical(enabled: bool = True, min_sites: int = 2) -> None:
+    """
+        Computes all-pairs distances for the metrics from per-site
+        tables and a backbone of border nodes (see SiteHierarchy) for
+        graphs with at least min_sites sites.
+    """
+    global __enabled, __min_sites
+    if min_sites < 1:
+        raise ValueError("Site count must be at least 1")
+    __enabled = enabled
+    __min_sites = min_sites
+
+def use_hierarchy(graph: Graph) -> bool:
+    """
+        Returns true if the graph's distances should come from its site hierarchy.
+    """
+    return __enabled and len(graph.attributes.values("site")) >= __min_sites
+
+class SiteTable:
+    """
+        Shortest distances between the nodes of one site, using only
+        the links inside the site.
+    """
+    __slots__ = ("adjacency", "nodes", "index", "rows", "borders", "backbone_ids")
+
+    def __init__(self, adjacency: dict[str, dict[str, float]]) -> None:
+        self.adjacency = adjacency
+        csr = CSRGraph.from_vertices(adjacency)
+        pf = PathFinder(csr)
+        self.nodes = csr.ids
+        self.index = csr.index
+        self.rows = [array("d", pf.sssp(s)[0]) for s in range(csr.node_count())]
+        # local IDs of the nodes with links to other sites, and their backbone IDs
+        self.borders: list[int] = []
+        self.backbone_ids: list[int] = []
+
+class SiteHierarchy:
+    """
+        Two-level shortest paths over the graph's sites, like OSPF areas.
+        Each site has its own table of distances over its internal links.
+        Border nodes (those with links to other sites) form a backbone
+        overlay, joined by the inter-site links and by their distances
+        within each site. A path between two nodes is the best of the
+        path inside their site and any path leaving through a border
+        node of one site, across the backbone and in through a border
+        node of the other, so tables grow with site size and border
+        count rather than with the whole graph.
+        Sites are only rebuilt when their internal links change.
+    """
+    def __init__(self, graph: Graph) -> None:
+        self.graph = graph
+        self.version = -1
+        self.sites: dict[str, SiteTable] = {}
+        self.site_of: dict[str, str] = {}
+        # sites whose tables the last refresh rebuilt
+        self.rebuilt: list[str] = []
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+            Brings the tables up to date with the graph's current version.
+            Sites whose internal links are unchanged keep their tables;
+            the backbone is always rebuilt.
+        """
+        graph = self.graph
+        if self.version == graph.version:
+            return
+
+        vertices = graph.get_nodes()
+        site_of = {node: graph.get_site(node) for node in vertices}
+        members: dict[str, list[str]] = {}
+        for node in vertices:
+            members.setdefault(site_of[node], []).append(node)
+
+        sites = {}
+        self.rebuilt = []
+        for site, nodes in members.items():
+            adjacency = {u: {v: w for v, w in vertices[u].items() if site_of[v] == site} for u in nodes}
+            table = self.sites.get(site)
+            if table is None or table.adjacency != adjacency:
+                table = SiteTable(adjacency)
+                self.rebuilt.append(site)
+            table.borders = [table.index[u] for u in nodes if len(adjacency[u]) < len(vertices[u])]
+            sites[site] = table
+
+        self.sites = sites
+        self.site_of = site_of
+        self.__build_backbone(vertices)
+        self.version = graph.version
+
+    def __build_backbone(self, vertices: dict[str, dict[str, float]]) -> None:
+        site_of = self.site_of
+        backbone: dict[str, dict[str, float]] = {}
+
+        for table in self.sites.values():
+            for b in table.borders:
+                u = table.nodes[b]
+                row = table.rows[b]
+                links = {table.nodes[c]: row[c] for c in table.borders
+                         if c != b and row[c] != float("inf")}
+                links.update((v, w) for v, w in vertices[u].items() if site_of[v] != site_of[u])
+                backbone[u] = links
+
+        csr = CSRGraph.from_vertices(backbone)
+        pf = PathFinder(csr)
+        self.backbone = csr
+        self.backbone_rows = [array("d", pf.sssp(s)[0]) for s in range(csr.node_count())]
+        for table in self.sites.values():
+            table.backbone_ids = [csr.index[table.nodes[b]] for b in table.borders]
+
+    def distance(self, node1: str, node2: str) -> float:
+        """
+            Shortest distance between two nodes.
+        """
+        self.refresh()
+        source = self.sites[self.site_of[node1]]
+        target = self.sites[self.site_of[node2]]
+        u, v = source.index[node1], target.index[node2]
+
+        best = source.rows[u][v] if source is target else float("inf")
+        for b1, g1 in zip(source.borders, source.backbone_ids):
+            d1 = source.rows[u][b1]
+            if d1 == float("inf"):
+                continue
+            backbone_row = self.backbone_rows[g1]
+            for b2, g2 in zip(target.borders, target.backbone_ids):
+                best = min(best, d1 + backbone_row[g2] + target.rows[b2][v])
+        return best
+
+    def row(self, node: str) -> array:
+        """
+            Shortest distances from a node to every node, indexed by
+            node ID (see Graph.snapshot).
+        """
+        self.refresh()
+        source = self.sites[self.site_of[node]]
+        u = source.index[node]
+
+        # best distance to each backbone node, leaving through any border of the site
+        via = [float("inf")] * self.backbone.node_count()
+        for b1, g1 in zip(source.borders, source.backbone_ids):
+            d1 = source.rows[u][b1]
+            if d1 != float("inf"):
+                via = [min(a, d1 + d) for a, d in zip(via, self.backbone_rows[g1])]
+
+        index = self.graph.snapshot().index
+        row = array("d", [float("inf")]) * len(index)
+        for table in self.sites.values():
+            dist = list(source.rows[u]) if table is source else [float("inf")] * len(table.nodes)
+            for b2, g2 in zip(table.borders, table.backbone_ids):
+                base = via[g2]
+                if base != float("inf"):
+                    dist = [min(a, base + d) for a, d in zip(dist, table.rows[b2])]
+            for node2, d in zip(table.nodes, dist):
+                row[index[node2]] = d
+        return row
+
+    def rows(self) -> list[array]:
+        """
+            Distance rows of every source, as MetricContext.distances() returns them.
+        """
+        self.refresh()
+        return [self.row(node) for node in self.graph.snapshot().ids]
+
+def get_hierarchy(graph: Graph) -> SiteHierarchy:
+    """
+        Returns the graph's SiteHierarchy, refreshed to its current version.
+    """
+    hierarchy = __hierarchies.get(graph)
+    if hierarchy is None:
+        hierarchy = SiteHierarchy(graph)
+        __hierarchies[graph] = hierarchy
+    hierarchy.refresh()
+    return hierarchy
@@ -0,0 +1,186 @@
+from heapq import heappush, heappop
+from array import array
+from graph import Graph
+from pathfinder import PathFinder
+from context import get_context
+
+class DynamicSPF:
+    """
+        Shortest distance rows of every source, kept up to date across
+        link cost changes like OSPF's incremental SPF: a change only
+        reruns the part of each source's tree that it affects.
+        A cost decrease spreads out from the link's far end while it
+        shortens paths; a cost increase first finds the nodes whose every
+        shortest path used the link, then recomputes just those from
+        their unaffected neighbours. Sources whose trees never reach the
+        link are not touched.
+        Link costs must be positive, as for Dijkstras.
+    """
+    def __init__(self, graph: Graph) -> None:
+        self.graph = graph
+        self.__build()
+
+    def __build(self) -> None:
+        self.version = self.graph.version
+        self.csr = self.graph.snapshot()
+        # a private copy of the costs, updated in place by each change
+        self.weights = self.csr.arrays()[2]
+        pf = PathFinder(self.csr)
+        self.rows = [array("d", pf.sssp(s)[0]) for s in range(self.csr.node_count())]
+
+    def set_weight(self, node1: str, node2: str, weight: float) -> dict[str, list[str]]:
+        """
+            Changes the cost of the link (node1, node2) in the graph and
+            updates every source's distances.
+            Returns source -> destinations whose distance changed, for the
+            sources that had any. The graph's metric context starts from
+            the updated rows instead of recomputing them.
+        """
+        if self.version != self.graph.version:
+            # the graph was changed some other way since the last update
+            self.__build()
+        self.graph.set_weight(node1, node2, weight)
+        self.version = self.graph.version
+
+        csr = self.csr
+        changes = self.update(csr.index[node1], csr.index[node2], weight)
+        self.csr = self.graph.snapshot()
+        get_context(self.graph).set_distances(list(self.rows))
+
+        ids = csr.ids
+        return {ids[s]: [ids[t] for t in targets] for s, targets in changes.items()}
+
+    def update(self, a: int, b: int, weight: float) -> dict[int, list[int]]:
+        """
+            Applies a new cost to the link between node IDs a and b.
+            Returns source ID -> IDs of the destinations whose distance
+            changed. Rows that change are replaced, not modified, so
+            rows handed out earlier keep the old distances.
+        """
+        k1, k2 = self.csr.slot(a, b), self.csr.slot(b, a)
+        if k1 < 0:
+            raise ValueError("Edge does not exist")
+        old = self.weights[k1]
+        self.weights[k1] = self.weights[k2] = weight
+        if weight == old or a == b:
+            return {}
+
+        changes = {}
+        for s, row in enumerate(self.rows):
+            da, db = row[a], row[b]
+            if da == float("inf"):
+                continue
+            if weight < old:
+                changed = self.__decrease(s, a, b, weight)
+            elif da + old == db:
+                changed = self.__increase(s, b)
+            elif db + old == da:
+                changed = self.__increase(s, a)
+            else:
+                continue
+            if changed:
+                changes[s] = changed
+        return changes
+
+    def __decrease(self, s: int, a: int, b: int, weight: float) -> list[int]:
+        """
+            Relaxes outwards from whichever end of the cheaper link now
+            has a shorter path through it.
+        """
+        row = self.rows[s]
+        da, db = row[a], row[b]
+        if da + weight < db:
+            start, dist = b, da + weight
+        elif db + weight < da:
+            start, dist = a, db + weight
+        else:
+            return []
+
+        offsets = self.csr.offsets
+        neighbours = self.csr.neighbours
+        weights = self.weights
+        row = array("d", row)
+        row[start] = dist
+        changed = {start}
+        heap = [(dist, start)]
+
+        while heap:
+            distance, current = heappop(heap)
+            if distance != row[current]:
+                continue
+            for i in range(offsets[current], offsets[current + 1]):
+                neighbour = neighbours[i]
+                new_dist = distance + weights[i]
+                if new_dist < row[neighbour]:
+                    row[neighbour] = new_dist
+                    changed.add(neighbour)
+                    heappush(heap, (new_dist, neighbour))
+
+        self.rows[s] = row
+        return sorted(changed)
+
+    def __increase(self, s: int, child: int) -> list[int]:
+        """
+            Recomputes the nodes below child in the source's tree that
+            have no shortest path left avoiding the dearer link.
+        """
+        offsets = self.csr.offsets
+        neighbours = self.csr.neighbours
+        weights = self.weights
+        row = self.rows[s]
+
+        # Nodes are decided in distance order, so all of a node's tree
+        # parents are decided first: it is affected if none is unaffected
+        affected = set()
+        heap = [(row[child], child)]
+        while heap:
+            distance, v = heappop(heap)
+            if v in affected:
+                continue
+            supported = False
+            for i in range(offsets[v], offsets[v + 1]):
+                u = neighbours[i]
+                if u not in affected and row[u] + weights[i] == distance:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected.add(v)
+            for i in range(offsets[v], offsets[v + 1]):
+                w = neighbours[i]
+                if distance + weights[i] == row[w]:
+                    heappush(heap, (row[w], w))
+
+        if not affected:
+            return []
+
+        old = row
+        row = array("d", row)
+        for v in affected:
+            row[v] = float("inf")
+
+        # Reconnect affected nodes through their unaffected neighbours,
+        # then run Dijkstras over the affected nodes only
+        heap = []
+        for v in affected:
+            for i in range(offsets[v], offsets[v + 1]):
+                u = neighbours[i]
+                if u not in affected and row[u] + weights[i] < row[v]:
+                    row[v] = row[u] + weights[i]
+            if row[v] != float("inf"):
+                heap.append((row[v], v))
+        heap.sort()
+
+        while heap:
+            distance, current = heappop(heap)
+            if distance != row[current]:
+                continue
+            for i in range(offsets[current], offsets[current + 1]):
+                neighbour = neighbours[i]
+                new_dist = distance + weights[i]
+                if neighbour in affected and new_dist < row[neighbour]:
+                    row[neighbour] = new_dist
+                    heappush(heap, (new_dist, neighbour))
+
+        self.rows[s] = row
+        return sorted(v for v in affected if row[v] != old[v])
@@ -0,0 +1,221 @@
+import glob
+import json
+import os
+import threading
+from graph import Graph
+from load_topology import data_path, topology_fingerprint
+from snapshot import save_snapshot, read_sequence, read_source, SNAPSHOT_EXTENSION
+
+JOURNAL_EXTENSION = ".journal"
+
+# Journal records written before a background compaction is started
+COMPACT_AFTER = 1000
+
+# Graph methods that are journaled and can be replayed
+OPERATIONS = {"add_node", "add_edge", "set_weight", "remove_node", "remove_edge", "set_attribute"}
+
+class Journal:
+    """
+        Append-only log of topology mutations, one JSON record per line.
+        Saving an edit appends a single record, no matter how large the
+        topology is. Compaction writes the whole graph to a fresh snapshot
+        in a background thread, after which the records it covers are dropped.
+        Each journal file starts with a header line holding the fingerprint
+        of the topology file the changes were made to (see open_graph),
+        which compaction also saves in the snapshot.
+    """
+    def __init__(self, graph: Graph, snapshot_path: str, journal_path: str,
+                 sequence: int = 0, fsync: bool = True, source: bytes = b"") -> None:
+        self.graph = graph
+        self.snapshot_path = snapshot_path
+        self.path = journal_path
+        self.sequence = sequence # sequence number of the last record written
+        self.fsync = fsync
+        self.source = source
+        self.records = len(read_records(journal_path))
+        self.__lock = threading.Lock()
+        self.__compaction: threading.Thread = None
+        self.__file = self.__open()
+
+    def append(self, op: str, *args) -> None:
+        """
+            Appends one mutation record and flushes it to disk.
+        """
+        with self.__lock:
+            self.sequence += 1
+            self.__file.write(json.dumps({"seq": self.sequence, "op": op, "args": list(args)}) + "\n")
+            self.__file.flush()
+            if self.fsync:
+                os.fsync(self.__file.fileno())
+            self.records += 1
+
+        if self.records >= COMPACT_AFTER:
+            self.compact()
+
+    def compact(self, wait: bool = False) -> None:
+        """
+            Starts compacting the journal into a new snapshot in the background.
+            The current journal file is set aside and a new one started, so
+            edits can continue while the snapshot is built and written from
+            an O(1) copy-on-write clone of the graph (see Graph.clone).
+        """
+        with self.__lock:
+            if self.__compaction is not None and self.__compaction.is_alive():
+                compaction = self.__compaction
+            else:
+                graph = self.graph.clone()
+                sequence = self.sequence
+
+                self.__file.close()
+                if os.path.getsize(self.path):
+                    os.replace(self.path, f"{self.path}.{sequence}")
+                self.__file = self.__open()
+                self.records = 0
+
+                compaction = threading.Thread(target=self.__write_snapshot, args=(graph, sequence))
+                self.__compaction = compaction
+                compaction.start()
+
+        if wait:
+            compaction.join()
+
+    def close(self) -> None:
+        """
+            Waits for any running compaction and closes the journal.
+        """
+        if self.__compaction is not None:
+            self.__compaction.join()
+        with self.__lock:
+            self.__file.close()
+
+    def __open(self):
+        f = open(self.path, "a", encoding="utf-8")
+        if self.source and not f.tell():
+            f.write(json.dumps({"source": self.source.hex()}) + "\n")
+            f.flush()
+        return f
+
+    def __write_snapshot(self, graph: Graph, sequence: int) -> None:
+        # Write then rename, so a crash leaves either the old or the new
+        # snapshot; set-aside journals are only deleted once it is in place
+        tmp = f"{self.snapshot_path}.tmp"
+        save_snapshot(graph.snapshot(), tmp, sequence, graph.attribute_columns(), self.source)
+        os.replace(tmp, self.snapshot_path)
+
+        for segment in journal_segments(self.path):
+            if int(segment.rsplit(".", 1)[1]) <= sequence:
+                os.remove(segment)
+
+def journal_segments(journal_path: str) -> list[str]:
+    """
+        Returns journal files set aside by compaction, oldest first.
+    """
+    segments = [p for p in glob.glob(glob.escape(journal_path) + ".*") if p.rsplit(".", 1)[1].isdigit()]
+    return sorted(segments, key=lambda p: int(p.rsplit(".", 1)[1]))
+
+def journal_source(path: str) -> bytes:
+    """
+        Returns the topology fingerprint in a journal file's header line
+        (empty if it has none).
+    """
+    if not os.path.exists(path):
+        return b""
+    with open(path, "rb") as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return b""
+    return bytes.fromhex(header["source"]) if isinstance(header, dict) and "source" in header else b""
+
+def read_records(path: str, repair: bool = False) -> list[dict]:
+    """
+        Reads the mutation records of a journal file (not its header).
+        A partly written last record (from a crash) is ignored, and cut
+        from the file if repair is set so later appends stay readable.
+    """
+    if not os.path.exists(path):
+        return []
+
+    records = []
+    good = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("Incomplete record")
+                record = json.loads(line)
+                if "seq" in record:
+                    records.append(record)
+            except ValueError:
+                break
+            good += len(line)
+
+    if repair and good < os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good)
+    return records
+
+def open_graph(topology: str = "topology.json", store: str = None, attach: bool = True) -> Graph:
+    """
+        Loads a topology with all of its saved changes: the latest compacted
+        snapshot if there is one (otherwise the JSON topology), followed by
+        the journal. Returns the graph with a Journal attached, so every
+        further change is saved as it is made. With attach unset the saved
+        files are only read, e.g. for batch commands run next to the menu.
+        Saved changes live next to the program (see load_topology.data_path)
+        unless a store path prefix is given. The store is named after the
+        topology file, so changes are only applied if they were made to a
+        file with the same contents. Otherwise the topology is loaded as
+        it is and, when attaching, the old changes are set aside with a
+        ".stale" suffix.
+    """
+    if store is None:
+        store = data_path(os.path.splitext(os.path.basename(topology))[0] + ".saved")
+    snapshot_path = store + SNAPSHOT_EXTENSION
+    journal_path = store + JOURNAL_EXTENSION
+
+    source = topology_fingerprint(topology)
+    saved = __saved_source(snapshot_path, journal_path)
+    if saved and saved != source:
+        # changes made to a different topology file with the same name
+        if not attach:
+            return Graph(topology)
+        for path in [snapshot_path] + journal_segments(journal_path) + [journal_path]:
+            if os.path.exists(path):
+                os.replace(path, path + ".stale")
+
+    if os.path.exists(snapshot_path):
+        graph = Graph(snapshot_path)
+        sequence = read_sequence(snapshot_path)
+    else:
+        graph = Graph(topology)
+        sequence = 0
+
+    last = sequence
+    for path in journal_segments(journal_path) + [journal_path]:
+        for record in read_records(path, repair=(attach and path == journal_path)):
+            if record["seq"] <= sequence:
+                continue # already in the snapshot
+            if record["op"] not in OPERATIONS:
+                raise ValueError(f"Unknown journal operation: {record['op']}")
+            getattr(graph, record["op"])(*record["args"])
+            last = record["seq"]
+
+    if attach:
+        graph.journal = Journal(graph, snapshot_path, journal_path, last, source=source)
+    return graph
+
+def __saved_source(snapshot_path: str, journal_path: str) -> bytes:
+    """
+        Fingerprint of the topology file that saved changes were made to,
+        empty if there are none or they were saved without one.
+    """
+    if os.path.exists(snapshot_path):
+        source = read_source(snapshot_path)
+        if source:
+            return source
+    for path in journal_segments(journal_path) + [journal_path]:
+        source = journal_source(path)
+        if source:
+            return source
+    return b""
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import sys
@@ -13,8 +14,20 @@ def extract_topology(topology_file: str):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-# TODO: Rewrite current topology with updated topology
-# To keep persistance
-def dump_topology(t: str):
-    with open(f"{t}") as f:
-        json.dumps
+def topology_fingerprint(topology_file: str) -> bytes:
+    """
+        Hashes the contents of a topology file (JSON or snapshot), so
+        changes saved for it are only applied to the same topology.
+    """
+    h = hashlib.sha256()
+    with open(resource_path(topology_file), "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.digest()
+
+def data_path(relative_path: str) -> str:
+    # Files written at runtime (saved changes) can't go in the PyInstaller
+    # bundle, which is a temporary directory, so keep them next to the executable
+    if hasattr(sys, "_MEIPASS"):
+        return os.path.join(os.path.dirname(sys.executable), relative_path)
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), relative_path)
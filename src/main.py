@@ -1,7 +1,14 @@
-from menu import Display_Menu
+import sys
 
 def main():
+    # any arguments run a batch command instead of the interactive menu
+    if len(sys.argv) > 1:
+        from cli import main as run_command
+        run_command(sys.argv[1:])
+        return
+
+    from menu import Display_Menu
     Display_Menu()
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,10 +1,16 @@
 import random as rand
-import pandas as pd
-from sklearn.model_selection import train_test_split
 from pathfinder import PathFinder
-from engine import Intelligence
 from graph import Graph
 from metric import *
+from dataset import split_variants, make_variant, generate_columns, feature_columns
+from parallel import get_workers
+from journal import open_graph
+from sampling import set_approximation
+from contingency import contingency_sweep, iter_n_minus_k
+from model_store import ModelStore, model_key
+
+# Features the delta_asp model predicts risk from
+RISK_FEATURES = ["degree", "closeness", "betweenness", "flow_count"]
 
 
 def Display_Menu() -> None:
@@ -16,7 +22,11 @@ def Display_Menu() -> None:
     print("-----------------------------------")
 
     topology = "topology.json"
-    g = Graph(topology)
+    # estimate betweenness and flow counts on large topologies
+    # so the metrics and predictive testing stay interactive
+    set_approximation(epsilon=0.1, min_nodes=2000)
+    # changes made here are journaled and restored on the next start
+    g = open_graph(topology)
     while True:
         cmd = __command()
         
@@ -38,6 +48,7 @@ def Display_Menu() -> None:
             case 8:
                 __predictive_testing(g, 200)
             case 9:
+                g.journal.close()
                 return
             case _:
                 print("Invalid input")
@@ -140,15 +151,29 @@ def __remove_edge(graph: Graph) -> None:
     return
 
 def __view_metrics(graph: Graph) -> None:
+    # per-node metrics are only computed for the chosen site's nodes
+    site = input("Enter a site to view (leave blank for all sites): ").strip()
+    nodes = None
+    if site:
+        nodes = graph.select(site=site)
+        if not nodes:
+            print("No nodes in that site. Going back...")
+            return
+    selected = set(nodes or graph.get_nodes())
+
     nodeToEdgeRatio = node_to_edge_ratio(graph)
     avgConnectivity = average_connectivity(graph)
-    nearestNeighbourFreq = nearest_neighbour_frequency(graph)
-    betweennessCentrality = betweenness_centrality(graph)
-    degreeCentrality = degree_centrality(graph)
-    closenessCentrality = closeness_centrality(graph)
-    averageShortestPath = average_shortest_path(graph)
-    edgeBetweenness = edge_betweenness(graph)
-    flowCount = flow_count(graph)
+    # needs every node's shortest paths, so only shown for the whole topology
+    nearestNeighbourFreq = nearest_neighbour_frequency(graph) if nodes is None else {}
+    betweennessCentrality = betweenness_centrality(graph, nodes=nodes)
+    degreeCentrality = degree_centrality(graph, nodes=nodes)
+    closenessCentrality = closeness_centrality(graph, nodes=nodes)
+    averageShortestPath = average_shortest_path(graph, nodes=nodes)
+    edgeBetweenness = {pair: value for pair, value in edge_betweenness(graph).items() if selected.intersection(pair)}
+    flowCount = {pair: value for pair, value in flow_count(graph).items() if selected.intersection(pair)}
+    bridgeLinks = [pair for pair in bridges(graph) if selected.intersection(pair)]
+    articulationPoints = [node for node in articulation_points(graph) if node in selected]
+    redundancyReport = redundancy_report(graph, nodes=nodes)
 
     # Impact levels for users
     impact_levels = {
@@ -167,9 +192,10 @@ def __view_metrics(graph: Graph) -> None:
 
     print(f"Node-to-Edge Ratio: {nodeToEdgeRatio}")
     print(f"Average Connectivity: {round(avgConnectivity, 2)}")
-    print(f"Average Shortest Path : {round(averageShortestPath, 2)}")
+    print(f"Average Shortest Path{f' (within {site})' if site else ''} : {round(averageShortestPath, 2)}")
 
-    print(f"Nearest-Neighbour Frequency:    (How often a node is the closest choice from another node.)")
+    if nearestNeighbourFreq:
+        print(f"Nearest-Neighbour Frequency:    (How often a node is the closest choice from another node.)")
     for node in nearestNeighbourFreq:
         print(f"    • {node} is the nearest neighbour to {len(nearestNeighbourFreq[node])} nodes {f': {nearestNeighbourFreq[node]}' if nearestNeighbourFreq[node] else ''}")
 
@@ -181,6 +207,14 @@ def __view_metrics(graph: Graph) -> None:
     for node in degreeCentrality:
         print(f"    • {node} = {round(degreeCentrality[node], 2)} | Impact -> {impact_levels[round(degreeCentrality[node], 1)]}")
 
+    errorBound = betweenness_error_bound(graph)
+    if errorBound:
+        print(f"Betweenness and flow counts are estimated from {errorBound['samples']} of {errorBound['sources']} sources. " \
+              f"With {round((1 - errorBound['delta']) * 100)}% confidence every value is within: " \
+              f"Betweenness ±{round(errorBound['betweenness'], 2)}, " \
+              f"Edge Betweenness ±{round(errorBound['edge_betweenness'], 2)}, " \
+              f"Flow Count ±{round(errorBound['flow_count'], 2)}")
+
     print("Betweenness Centrality:  (How often each node lies on the shortest path between other nodes)")
     for node in betweennessCentrality:
         print(f"    • {node} = {round(betweennessCentrality[node], 2)}")
@@ -193,6 +227,17 @@ def __view_metrics(graph: Graph) -> None:
     for pair in flowCount:
         print(f"    • {pair[0]} - {pair[1]} = {round(flowCount[pair], 2)}")
 
+    print("Bridges:     (Links whose failure disconnects the network)")
+    for pair in bridgeLinks:
+        print(f"    • {pair[0]} - {pair[1]}")
+
+    print("Articulation Points:     (Nodes whose failure disconnects the network)")
+    for node in articulationPoints:
+        print(f"    • {node} | disconnects {redundancyReport[node]['disconnected_pairs']} node pairs")
+
+    redundant = sum(1 for node in redundancyReport if redundancyReport[node]["redundant"])
+    print(f"Redundancy: {redundant}/{len(redundancyReport)} nodes survive any single failure of themselves or their links")
+
 def __testing(graph: Graph) -> None:
     print("Please choose a test to run...\n")
     pf = PathFinder(graph)
@@ -205,7 +250,9 @@ def __testing(graph: Graph) -> None:
                 "1. Performance Test (Dijkstras): \n" \
                 "2. Connectivity Test (BFS): \n" \
                 "3. Average Shortest Path on removed node: \n" \
-                "4. Average Shortest Path on removed edge: \n" 
+                "4. Average Shortest Path on removed edge: \n" \
+                "5. N-1 Contingency Sweep (every node and edge failure): \n" \
+                "6. N-k Contingency Analysis (simultaneous edge failures): \n"
             ))
         except:
             print("Invalid command. Going back...")
@@ -215,7 +262,7 @@ def __testing(graph: Graph) -> None:
             if start_node not in graph_nodes:
                 print("Node does not exist.")
                 continue
-            fastest_path, _, _, _ = pf.dijkstras(start_node)
+            fastest_path = pf.distances(start_node)
             for i, node in enumerate(fastest_path):
                 if start_node == node:
                     continue
@@ -265,11 +312,49 @@ def __testing(graph: Graph) -> None:
             print(f"Performance has {'INCREASED (how?)' if new_shortest_path < cur_shortest_path else 'DECREASED (valuable edge)' if new_shortest_path > cur_shortest_path else 'not changed (redundant edge)'}")
             print(f"Failure impact score: {failureImpactScore} | {round((failureImpactScore-1)*100, 1)}%")
             return
+        elif cmd == 5:
+            print(f"Average shortest path BEFORE any failure: {round(cur_shortest_path, 2)}")
+            print("Failures ranked from worst to least impact:")
+            for i, row in enumerate(contingency_sweep(graph, workers=get_workers())):
+                element = row["element"] if row["type"] == "node" else f"{row['element'][0]} - {row['element'][1]}"
+                print(f"{i+1} : {row['type'].capitalize()} {element} | " \
+                      f"ASP {round(row['asp'], 2)} | " \
+                      f"Impact {round((row['impact']-1)*100, 1)}% | " \
+                      f"{row['disconnected_pairs']} pairs disconnected")
+            return
+        elif cmd == 6:
+            try:
+                k = int(input("Enter the maximum number of simultaneous edge failures (k): "))
+            except:
+                print("Invalid number. Going back...")
+                continue
+            if k < 1:
+                print("k must be at least 1.")
+                continue
+            worst = []
+            next_report = 0.0
+            for done, total, worst in iter_n_minus_k(graph, k, workers=get_workers()):
+                # progress every 10% with the worst combination so far
+                if done >= next_report * total and worst:
+                    print(f"{done}/{total} combinations | worst so far: " \
+                          f"{', '.join(f'{e[0]} - {e[1]}' for _, e in worst[0]['failures'])}")
+                    next_report = done / total + 0.1
+            print(f"Average shortest path BEFORE any failure: {round(cur_shortest_path, 2)}")
+            print(f"Worst combinations of up to {k} edge failures:")
+            for i, row in enumerate(worst):
+                print(f"{i+1} : {', '.join(f'{e[0]} - {e[1]}' for _, e in row['failures'])} | " \
+                      f"ASP {round(row['asp'], 2)} | " \
+                      f"Impact {round((row['impact']-1)*100, 1)}% | " \
+                      f"{row['disconnected_pairs']} pairs disconnected")
+            return
         else:
             print("Invalid command. Going back...")
             return
         
 def __predictive_testing(graph: Graph, sample_size: int = 50) -> None:
+    # the ML stack is slow to import, so only load it when needed
+    from engine import Intelligence
+
     target = input(
         "Enter a target feature -\n"
         "- Betweenness Centrality (bc)\n" \
@@ -278,8 +363,6 @@ def __predictive_testing(graph: Graph, sample_size: int = 50) -> None:
         "- Flow Count (fc)\n" \
         "- Delta (Δ) Average Shortest Path (asp)\n"
         )
-    
-    rows = []
 
     match target.lower():
         case "bc":
@@ -296,23 +379,27 @@ def __predictive_testing(graph: Graph, sample_size: int = 50) -> None:
             print("Invalid target. Going back...")
             return
         
-    graphs: list[Graph] = []
-    
-    for i in range(sample_size):
-        g = graph.clone()
-        __perturb_weights_once(g)
-        graphs.append(g)
-    
-    train_graphs, test_graphs = train_test_split(
-    graphs,
-    test_size=0.2,
-    random_state=42
-    )
-
-    for i, g in enumerate(train_graphs):
-        __gen_rows(g, i, rows)
-        
-    model = Intelligence(rows, target)
+    # A model already trained on this topology is reused, along with
+    # the seed of its variants so it is tested on its held-out variants
+    store = ModelStore()
+    key = model_key(graph.snapshot(), target, sample_size)
+    model = store.load(key)
+    if model is not None:
+        seed = store.entry(key)["seed"]
+        print("Using the saved model for this topology")
+    else:
+        # Each variant gets its own seed derived from this one, so a run
+        # can be reproduced regardless of worker count
+        seed = rand.randrange(2**32)
+
+    train_variants, test_variants = split_variants(sample_size)
+    trained = model is None
+    if trained:
+        columns = generate_columns(graph, train_variants, seed, get_workers())
+        model = Intelligence(columns, target, get_workers())
+        store.save(key, model, target=target, variants=sample_size, seed=seed)
+    test_graphs = [make_variant(graph, seed, v) for v in test_variants]
+
     max_risk = float("-inf")
 
     if target == "delta_asp":
@@ -323,77 +410,18 @@ def __predictive_testing(graph: Graph, sample_size: int = 50) -> None:
         print(f"Max risk score: {max_risk} | ASP increases by around {round(max_risk, 2)} path cost on the most critical singular node failure -> Removed {worst_node}")
         print(f"Worst case is {round((spike-1)*100, 1)}% worse than average")
 
+    print(f"Seed: {seed}")
     model.display_model_score()
-    model.save()
-
-def __gen_rows(graph: Graph, id: int, rows: list = []) -> None:
-    nodes = graph.get_nodes()
-
-    __perturb_weights_once(graph)
-
-    bc = betweenness_centrality(graph)
-    cc = closeness_centrality(graph)
-    dc = degree_centrality(graph)
-
-    for node in nodes:
-        flow_c = 0
-        flowCount = flow_count(graph, node)
-        for neighbour in flowCount:
-            flow_c += flowCount[neighbour]
-        rows.append(
-            {
-                "variant_id": id,
-                "node": node,
-                "degree": dc[node],
-                "closeness": cc[node],
-                "betweenness": bc[node],
-                "flow_count": flow_c,
-                "delta_asp": failure_impact_score(graph, node)[1],
-            }
-        )
-
-# models congestion on edges
-def __perturb_weights_once(g: Graph, low=0.8, high=1.2) -> None:
-    seen = set()
-    for u in g.get_nodes():
-        for v, w in g.get_edges(u).items():
-            e = (u, v) if u < v else (v, u)
-            if e in seen:
-                continue
-            seen.add(e)
-
-            factor = rand.uniform(low, high)
-            new_w = w * factor
+    if trained:
+        # saved models don't keep their training dataset
+        model.save()
 
-            # update both directions (undirected)
-            g.get_edges(u)[v] = new_w
-            g.get_edges(v)[u] = new_w
+def __risk_score(model: "Intelligence", *graphs: Graph) -> float:
+    import pandas as pd
 
-def __risk_score(model: Intelligence, *graphs: Graph) -> float:
-    
-    rows = []
     risk = 0.0
 
-    for graph in graphs:
-        nodes = graph.get_nodes()
-        dc = degree_centrality(graph)
-        cc = closeness_centrality(graph)
-        bc = betweenness_centrality(graph)
-
-        for n in nodes:
-            flow_c = 0
-            flowCount = flow_count(graph, n)
-            for neighbour in flowCount:
-                flow_c += flowCount[neighbour]
-            
-            rows.append({
-                "degree": dc[n],
-                "closeness": cc[n],
-                "betweenness": bc[n],
-                "flow_count": flow_c
-                })
-
-    X_df = pd.DataFrame(rows)
+    X_df = pd.DataFrame(__risk_features(*graphs)[0])
 
     preds = model.predict(X_df)
 
@@ -401,32 +429,12 @@ def __risk_score(model: Intelligence, *graphs: Graph) -> float:
     
     return risk
 
-def __max_risk_score(model: Intelligence, max_risk: float, *graphs: Graph) -> float:
-
-    rows = []
-    node_index = []
-
-    for i, graph in enumerate(graphs):
-        nodes = graph.get_nodes()
-        dc = degree_centrality(graph)
-        cc = closeness_centrality(graph)
-        bc = betweenness_centrality(graph)
-        for n in nodes:
-            flow_c = 0
-            flowCount = flow_count(graph, n)
-            for neighbour in flowCount:
-                flow_c += flowCount[neighbour]
-            
-            rows.append({
-                "degree": dc[n],
-                "closeness": cc[n],
-                "betweenness": bc[n],
-                "flow_count": flow_c
-                })
-            
-            node_index.append((i, n))
-
-    X_df = pd.DataFrame(rows)
+def __max_risk_score(model: "Intelligence", max_risk: float, *graphs: Graph) -> float:
+    import pandas as pd
+
+    columns, node_index = __risk_features(*graphs)
+
+    X_df = pd.DataFrame(columns)
 
     preds = model.predict(X_df)
 
@@ -436,5 +444,17 @@ def __max_risk_score(model: Intelligence, max_risk: float, *graphs: Graph) -> fl
 
     return max(max_risk, worst_case), worst_node
 
+def __risk_features(*graphs: Graph) -> tuple[dict, list]:
+    """
+        Feature columns for every node of the graphs, one graph after
+        another, and the (graph index, node) of each row.
+    """
+    import numpy as np
+
+    per_graph = [feature_columns(graph, RISK_FEATURES) for graph in graphs]
+    columns = {feature: np.concatenate([c[feature] for c in per_graph]) for feature in RISK_FEATURES}
+    node_index = [(i, node) for i, c in enumerate(per_graph) for node in c["node"]]
+    return columns, node_index
+
 def __risk_spike(mean_risk: float, max_risk: float) -> float:
     return max_risk/mean_risk
\ No newline at end of file
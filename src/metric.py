@@ -1,5 +1,7 @@
-from pathfinder import PathFinder
 from graph import Graph
+from context import get_context, average_pair_distance
+from failure import get_failure_analyzer
+from connectivity import get_connectivity
 
 def node_to_edge_ratio(graph: Graph) -> float:
     n = len(graph.get_nodes())
@@ -21,41 +23,42 @@ def average_connectivity(graph: Graph) -> float:
 
 def nearest_neighbour_frequency(graph: Graph) -> dict:
 
-    nodes = graph.get_nodes()
-    pf = PathFinder(graph)
-    
-    cur_min_edge = float("inf")
-    cur_min_node = None
+    ctx = get_context(graph)
+    ids = ctx.csr.ids
 
-    node_contains_shortest_path_count = {n:set() for n in nodes}
+    node_contains_shortest_path_count = {n:set() for n in ids}
 
-    for node in nodes:
+    for node, distance in enumerate(ctx.distances()):
         cur_min_edge = float("inf")
         cur_min_node = None
 
-        distance, _, _, _ = pf.dijkstras(node)
-        for to_node in distance:
-            if distance[to_node] < cur_min_edge and to_node != node:
-                cur_min_edge = distance[to_node]
+        for to_node, dist in enumerate(distance):
+            if dist < cur_min_edge and to_node != node:
+                cur_min_edge = dist
                 cur_min_node = to_node
-        if cur_min_node:        
-            node_contains_shortest_path_count[cur_min_node].add(node)
+        if cur_min_node is not None:
+            node_contains_shortest_path_count[ids[cur_min_node]].add(ids[node])
     
     return node_contains_shortest_path_count
         
-def degree_centrality(graph: Graph, node1: str = None):
+def degree_centrality(graph: Graph, node1: str = None, nodes: list[str] = None):
     """
     Calculates the degree centrality for all nodes in graph 
+    (or only the given nodes, e.g. from Graph.select)
     then stores and returns them in a dictionary. Each value will be 
     between 0.0 and 1.0.
     """
-    nodes = graph.get_nodes()
+    all_nodes = graph.get_nodes()
+    if nodes is None:
+        nodes = all_nodes
+    else:
+        __check_nodes(graph, nodes)
 
-    if len(nodes) <= 1:
+    if len(all_nodes) <= 1:
         return {node: 0.0 for node in nodes}
 
     # All nodes in list, minus current node
-    node_count = len(nodes) - 1
+    node_count = len(all_nodes) - 1
 
     Dc_map = {n:0 for n in nodes}
 
@@ -65,121 +68,210 @@ def degree_centrality(graph: Graph, node1: str = None):
     
     return Dc_map if not node1 else Dc_map[node1]
 
-def closeness_centrality(graph: Graph, node1: str = None):
+def closeness_centrality(graph: Graph, node1: str = None, nodes: list[str] = None):
     """
     Calculates the closeness centrality for all nodes in graph 
     then stores and returns them in a dictionary. Each value will be 
     between 0.0 and 1.0.
+    Given a list of nodes, only their shortest paths are computed.
     """
-    pf = PathFinder(graph)
-    nodes = graph.get_nodes()
-    
+    ctx = get_context(graph)
+    ids = ctx.csr.ids
 
-    Cc_map = {n:0 for n in nodes}
+    if nodes is None:
+        sources = range(len(ids))
+        rows = ctx.distances()
+    else:
+        __check_nodes(graph, nodes)
+        sources = [ctx.csr.index[node] for node in nodes]
+        rows = ctx.rows_for(sources)
 
-    for node in nodes:
+    Cc_map = {ids[n]:0 for n in sources}
+
+    for node, shortest_path in zip(sources, rows):
         total = 0
         reachable = 0
-        shortest_path, _, _, _ = pf.dijkstras(node)
-        for target, dist in shortest_path.items():
+        for target, dist in enumerate(shortest_path):
             if target != node:
                 total += dist
                 reachable += 1
 
         if total > 0:
-            Cc_map[node] = reachable / total
+            Cc_map[ids[node]] = reachable / total
         else:
-            Cc_map[node] = 0
+            Cc_map[ids[node]] = 0
 
     return Cc_map if not node1 else Cc_map[node1]
 
 
-def average_shortest_path(graph: Graph) -> float:
-    nodes = graph.get_nodes()
-    pf = PathFinder(graph)
-
-    total = 0.0
-    pair_count = 0
-
-    # To avoid double-counting in undirected graphs
-    seen = set()
-
-    for u in nodes:
-        dist, _, _, _ = pf.dijkstras(u)
-        if not dist:
-            continue
-
-        for v, d in dist.items():
-            if u == v:
-                continue
-
-            pair = (u, v) if u < v else (v, u)
-            if pair in seen:
-                continue
-
-            seen.add(pair)
-            total += d
-            pair_count += 1
-
-    return total / pair_count if pair_count > 0 else 0.0
-
-def betweenness_centrality(graph: Graph, node1: str = None) -> dict:
+def average_shortest_path(graph: Graph, nodes: list[str] = None) -> float:
+    """
+    Average shortest path over all pairs of nodes, or only over
+    pairs of the given nodes (running only their shortest paths).
+    """
+    ctx = get_context(graph)
+    n = ctx.csr.node_count()
+
+    if nodes is not None:
+        __check_nodes(graph, nodes)
+        sources = [ctx.csr.index[node] for node in nodes]
+        total = 0.0
+        unreached = 0
+        for i, row in enumerate(ctx.rows_for(sources)):
+            for t in sources[i + 1:]:
+                if row[t] == float("inf"):
+                    unreached += 1
+                else:
+                    total += row[t]
+        k = len(sources)
+        return average_pair_distance(total, unreached, k * (k - 1) // 2)
+
+    # Undirected graphs: each pair (u, v) is only counted from the
+    # source that comes first in node ID order
+    totals, unreached = ctx.pair_totals()
+
+    return average_pair_distance(sum(totals), sum(unreached), n * (n - 1) // 2)
+
+def betweenness_centrality(graph: Graph, node1: str = None, epsilon: float = None, time_budget: float = None,
+                           nodes: list[str] = None) -> dict:
     """
     Calculates the betweenness centrality for all nodes in graph 
     or all shortest paths node1 is in,
     then stores and returns them in a dictionary.
+    Estimated from a sample of sources if epsilon or time_budget
+    is given (see betweenness_error_bound).
+    Given a list of nodes, only their values are returned
+    (they still depend on every source's shortest paths).
     """
-    pf = PathFinder(graph)
-
-    return pf.brandes()[0] if not node1 else pf.brandes(node1)[0]
-
-def edge_betweenness(graph: Graph, node1: str = None) -> dict:
+    CB = get_context(graph).brandes(epsilon, time_budget)[0]
+
+    if nodes is not None:
+        __check_nodes(graph, nodes)
+        return {node: CB[node] for node in nodes}
+    if not node1:
+        return dict(CB)
+    if node1 not in CB:
+        raise ValueError("Node does not exist in current graph")
+    return {node1: CB[node1]}
+
+def edge_betweenness(graph: Graph, node1: str = None, epsilon: float = None, time_budget: float = None) -> dict:
     """
     Calculates the edge betweenness for all nodes in graph 
     or all incident edges from a source node,
     then stores and returns them in a dictionary.
+    Estimated from a sample of sources if epsilon or time_budget
+    is given (see betweenness_error_bound).
     """
-    pf = PathFinder(graph)
+    EB = get_context(graph).brandes(epsilon, time_budget)[1]
 
-    return pf.brandes()[1] if not node1 else pf.brandes(node1)[1]
+    return dict(EB) if not node1 else {e: EB[e] for e in __incident_edges(graph, node1)}
 
-def flow_count(graph: Graph, node1: str = None) -> dict:
+def flow_count(graph: Graph, node1: str = None, epsilon: float = None, time_budget: float = None) -> dict:
     """
     Calculates the measure of numers of shortest-path 
     routes traversing each link, including end traffic 
     point.
+    Estimated from a sample of sources if epsilon or time_budget
+    is given (see betweenness_error_bound).
     """
-    
-    pf = PathFinder(graph)
+    edge_flow = get_context(graph).brandes(epsilon, time_budget)[2]
+
+    return dict(edge_flow) if not node1 else {e: edge_flow[e] for e in __incident_edges(graph, node1)}
+
+def node_flow_count(graph: Graph, node1: str = None, epsilon: float = None, time_budget: float = None,
+                    nodes: list[str] = None):
+    """
+    Calculates the total flow count over each node's incident
+    links for all nodes in graph (or the given nodes), from a single Brandes' pass.
+    Equivalent to summing flow_count(graph, node) per node.
+    """
+    node_flow = get_context(graph).brandes(epsilon, time_budget)[3]
 
-    return pf.brandes()[2] if not node1 else pf.brandes(node1)[2]
+    if nodes is not None:
+        __check_nodes(graph, nodes)
+        return {node: node_flow[node] for node in nodes}
+    return dict(node_flow) if not node1 else node_flow[node1]
+
+def betweenness_error_bound(graph: Graph, epsilon: float = None, time_budget: float = None):
+    """
+    Returns the error bound of the betweenness, edge betweenness
+    and flow counts computed with the same arguments, as a dictionary
+    (see sampling.bound_report), or None if they are exact.
+    """
+    return get_context(graph).brandes_bound(epsilon, time_budget)
+
+def bridges(graph: Graph) -> list[tuple[str, str]]:
+    """
+    Returns the edge keys of all links whose failure
+    disconnects the network (see connectivity.Connectivity).
+    """
+    conn = get_connectivity(graph)
+    return [conn.csr.edge_key(e) for e in sorted(conn.bridges)]
+
+def articulation_points(graph: Graph) -> list[str]:
+    """
+    Returns all nodes whose failure disconnects the remaining nodes.
+    """
+    conn = get_connectivity(graph)
+    return [conn.csr.ids[v] for v in sorted(conn.articulation_points)]
+
+def biconnected_components(graph: Graph) -> list[list[tuple[str, str]]]:
+    """
+    Returns the biconnected components of the graph as lists of edge keys.
+    Within a component no single node or link failure disconnects two nodes.
+    """
+    conn = get_connectivity(graph)
+    return [[conn.csr.edge_key(e) for e in edges] for edges in conn.biconnected_components]
+
+def redundancy_report(graph: Graph, node1: str = None, nodes: list[str] = None):
+    """
+    Returns, per node (or for the given nodes), whether it is an
+    articulation point, its number of bridge links and biconnected
+    components, the node pairs its failure disconnects and whether
+    it is redundant.
+    """
+    report = get_connectivity(graph).redundancy_report()
+    if nodes is not None:
+        __check_nodes(graph, nodes)
+        return {node: report[node] for node in nodes}
+    return report if not node1 else report[node1]
+
+def __check_nodes(graph: Graph, nodes: list[str]) -> None:
+    """
+    Raises ValueError if any of the nodes is not in the graph.
+    """
+    missing = [node for node in nodes if node not in graph.get_nodes()]
+    if missing:
+        raise ValueError(f"Node does not exist in current graph: {missing[0]}")
+
+def __incident_edges(graph: Graph, node1: str) -> list[tuple[str, str]]:
+    """
+    Returns the edge keys of all links incident to node1.
+    """
+    if node1 not in graph.get_nodes():
+        raise ValueError("Node does not exist in current graph")
+    return [(node1, v) if node1 < v else (v, node1) for v in graph.get_edges(node1) if v != node1]
         
 def failure_impact_score(graph: Graph, rm_node: str = None, rm_edge: tuple = None) -> tuple:
     """
         Calculates the average shortest path when a node or an edge
         has been removed.
         Returns a tuple of floats with the resulting average shortest path.
+        Only sources whose shortest path trees use the removed
+        element are recomputed (see failure.FailureAnalyzer).
     """
-    cur_avg_shortest_path = average_shortest_path(graph)
-    cpy_graph: Graph = graph.clone()
-    nodes = cpy_graph.get_nodes()
+    nodes = graph.get_nodes()
+    analyzer = get_failure_analyzer(graph)
 
     if rm_node:
         if rm_node not in nodes:
             raise ValueError("Node does not exist in current graph")
-        cpy_graph.remove_node(rm_node)
+        return analyzer.node_failure(rm_node)
     elif rm_edge and len(rm_edge) == 2:
         if rm_edge[0] not in nodes or rm_edge[1] not in nodes:
             raise ValueError("One or both nodes do not exist in current graph")
-        if rm_edge[1] not in cpy_graph.get_edges(rm_edge[0]):
+        if rm_edge[1] not in graph.get_edges(rm_edge[0]):
             raise ValueError("Edge does not exist in current graph")
-        cpy_graph.remove_edge(rm_edge[0], rm_edge[1])
+        return analyzer.edge_failure(rm_edge[0], rm_edge[1])
     else:
         raise ValueError("Remove node or remove edge must be specified")
-    
-    new_avg_shortest_path = average_shortest_path(cpy_graph)
-
-    return new_avg_shortest_path, new_avg_shortest_path/cur_avg_shortest_path
-
-
-
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+from csr import CSRGraph
+from load_topology import data_path
+import sampling
+
+# Bumped whenever training features change meaning (see dataset.FEATURES),
+# so models trained on older features are never reused
+FEATURES_VERSION = 1
+
+# Bumped whenever the pickled model changes format (see engine.Intelligence),
+# so older files are retrained instead of failing to load
+MODEL_VERSION = 2
+
+# Eviction policy: models unused for MAX_AGE_DAYS are dropped, then the
+# least recently used beyond MAX_MODELS
+MAX_MODELS = 20
+MAX_AGE_DAYS = 30
+
+INDEX_FILE = "models.json"
+
+def model_key(csr: CSRGraph, target: str, variants: int, seed: int = None, **params) -> str:
+    """
+        Key for a model trained on a topology with the given generation
+        parameters. A seed of None matches a model trained with any seed.
+        Features estimated from sampled sources (see sampling.set_approximation)
+        give different models, so the sampling in effect for the topology
+        is part of the key.
+    """
+    key = {
+        "topology": csr.fingerprint().hex(),
+        "features": FEATURES_VERSION,
+        "model": MODEL_VERSION,
+        "target": target,
+        "variants": variants,
+        "seed": seed,
+        **params,
+    }
+    approximation = sampling.get_approximation(csr.node_count())
+    if approximation is not None:
+        # left out when exact, so keys of exact models are unchanged
+        key["approximation"] = list(approximation)
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+class ModelStore:
+    """
+        Trained models saved on disk by key (see model_key), so a model
+        is loaded instead of retrained while the topology and generation
+        parameters are unchanged.
+        An index file records when each model was saved and last used,
+        for the eviction policy.
+    """
+    def __init__(self, directory: str = None, max_models: int = MAX_MODELS, max_age_days: float = MAX_AGE_DAYS) -> None:
+        self.directory = directory or data_path("models")
+        self.max_models = max_models
+        self.max_age = max_age_days * 86400
+        os.makedirs(self.directory, exist_ok=True)
+
+    def load(self, key: str):
+        """
+            Returns the saved model for a key, or None if there is none.
+        """
+        index = self.__read_index()
+        if key not in index:
+            return None
+        try:
+            with open(self.__path(key), "rb") as f:
+                model = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            # missing or damaged: forget it so it is retrained
+            del index[key]
+            self.__write_index(index)
+            return None
+
+        index[key]["last_used"] = time.time()
+        self.__write_index(index)
+        return model
+
+    def entry(self, key: str) -> dict:
+        """
+            Returns the index entry of a saved model (when it was saved and
+            last used, plus the info given to save), or None.
+        """
+        return self.__read_index().get(key)
+
+    def save(self, key: str, model, **info) -> None:
+        """
+            Saves a trained model under a key, with extra info for its
+            index entry (such as the seed it was trained with), then
+            applies the eviction policy.
+        """
+        tmp = self.__path(key) + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(model, f)
+        os.replace(tmp, self.__path(key))
+
+        now = time.time()
+        index = self.__read_index()
+        index[key] = {"saved": now, "last_used": now, **info}
+        self.__write_index(self.__evict(index, now))
+
+    def evict(self) -> list[str]:
+        """
+            Applies the eviction policy now. Returns the evicted keys.
+        """
+        index = self.__read_index()
+        kept = self.__evict(index, time.time())
+        self.__write_index(kept)
+        return [key for key in index if key not in kept]
+
+    def __evict(self, index: dict, now: float) -> dict:
+        by_use = sorted(index, key=lambda key: index[key]["last_used"], reverse=True)
+        kept = [key for key in by_use if now - index[key]["last_used"] <= self.max_age][:self.max_models]
+
+        for key in index:
+            if key not in kept:
+                try:
+                    os.remove(self.__path(key))
+                except FileNotFoundError:
+                    pass
+        return {key: index[key] for key in kept}
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pkl")
+
+    def __read_index(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def __write_index(self, index: dict) -> None:
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(path + ".tmp", path)
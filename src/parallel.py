@@ -0,0 +1,52 @@
+from concurrent.futures import ProcessPoolExecutor
+from csr import CSRGraph
+from pathfinder import PathFinder
+
+# Default worker count for shared metric computations (see context)
+__workers = 1
+
+# Snapshot held by each pool worker, sent once by the pool initializer
+__worker_csr: CSRGraph = None
+
+def set_workers(workers: int) -> None:
+    """
+        Sets the number of worker processes used for Brandes'
+        in the shared metric context. 1 runs serially.
+    """
+    global __workers
+    if workers < 1:
+        raise ValueError("Worker count must be at least 1")
+    __workers = workers
+
+def get_workers() -> int:
+    return __workers
+
+def __init_worker(csr: CSRGraph) -> None:
+    global __worker_csr
+    __worker_csr = csr
+
+def __accumulate_partition(task: tuple) -> tuple:
+    sources, keep_rows = task
+    return PathFinder(__worker_csr).accumulate_partition(sources, keep_rows)
+
+def map_partitions(csr: CSRGraph, partitions: list[range], workers: int, keep_rows: bool = False):
+    """
+        Runs Brandes' accumulation for each partition of sources in a
+        process pool. The snapshot is sent to each worker once.
+        Yields partial results in partition order.
+    """
+    workers = min(workers, len(partitions))
+    with ProcessPoolExecutor(max_workers=workers, initializer=__init_worker, initargs=(csr,)) as pool:
+        yield from pool.map(__accumulate_partition, [(sources, keep_rows) for sources in partitions])
+
+def __next_hop_chunk(destinations: range) -> list[list]:
+    return PathFinder(__worker_csr).next_hop_columns(destinations)
+
+def map_next_hops(csr: CSRGraph, chunks: list[range], workers: int):
+    """
+        Runs PathFinder.next_hop_columns for each chunk of destinations
+        in a process pool. Yields results in chunk order.
+    """
+    workers = min(workers, len(chunks))
+    with ProcessPoolExecutor(max_workers=workers, initializer=__init_worker, initargs=(csr,)) as pool:
+        yield from pool.map(__next_hop_chunk, chunks)
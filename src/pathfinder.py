@@ -1,45 +1,24 @@
-import heapq as hq # importing in-built heap for efficient Dijkstras
+from heapq import heappush, heappop # in-built heap of (distance, node ID) tuples for efficient Dijkstras
+from array import array
+from operator import add
 from queue import Queue # built-in queue for BFS
 from graph import Graph
+from csr import CSRGraph
 
-class HeapItem:
-    def __init__(self, nodeID: str, distance: float) -> None:
-        """
-            Initialises HeapItem object to store
-            nodes and their current distance travelled
-        """
-        self.nodeID = nodeID
-        self.distance = distance
-
-    def get_distance(self) -> float:
-        """
-            Returns distance of current node
-        """
-        return self.distance
-    
-    def get_node_id(self) -> str:
-        """
-            Returns current node
-        """
-        return self.nodeID
-
-    # heapq uses __lt__ for ordering (min-heap)
-    def __lt__(self, other: object) -> bool:
-        """
-            returns true if current nodes distance
-            is shorter than compared nodes distance.
-            Returns false if not.
-            Used for min-heap ordering.
-        """
-        return self.distance < other.distance
+# Sources per Brandes' partition. Partitions depend only on the node count,
+# so partial sums merge in the same order for any number of workers.
+PARTITION_SIZE = 64
 
 class PathFinder:
-    def __init__(self, graph: Graph) -> None:
+    def __init__(self, graph: Graph | CSRGraph) -> None:
         """
             Initialises PathFinder Object with
             specified topology.
+            Shortest path algorithms run on a CSR snapshot of the
+            graph, taken when the PathFinder is created.
         """
         self.graph = graph
+        self.csr = graph if isinstance(graph, CSRGraph) else graph.snapshot()
 
     # Dijkstras defines the graphs performance
     # Simulates OSPF Routing
@@ -54,58 +33,170 @@ class PathFinder:
             Sigma function, used to count number of shortest paths,
             Stack of all nodes in nondecreasing distance order.
         """
-        adj = self.graph.get_nodes()
+        ids = self.csr.ids
+        distances, pred, _, sigma, S = self.spf(self.csr.index[start_id])
+
+        return (
+            dict(zip(ids, distances)),
+            {ids[v]: [ids[u] for u in p] if p else [] for v, p in enumerate(pred)},
+            dict(zip(ids, sigma)),
+            [ids[v] for v in S],
+        )
+
+    def spf(self, source: int) -> tuple:
+        """
+            Dijkstras over the CSR snapshot using interned node IDs.
+            Same traversal as dijkstras, without hashing node names.
+            Returns a tuple in order of:
+            Shortest distances indexed by node ID,
+            Predecessor node IDs on shortest paths (None if unreached),
+            Predecessor edge IDs, parallel to the predecessor node IDs,
+            Sigma function, used to count number of shortest paths,
+            Stack of node IDs in nondecreasing distance order.
+        """
+        csr = self.csr
+        offsets = csr.offsets
+        neighbours = csr.neighbours
+        weights = csr.weights
+        edge_ids = csr.edge_ids
+        n = csr.node_count()
 
-        # distances to be overriden by shorter distances from start to node_id
-        distances = {node_id: float('inf') for node_id in adj}
-        distances[start_id] = 0
+        distances = [float("inf")] * n
+        distances[source] = 0.0
 
-        # number of shortest paths from start_id to v
-        sigma = {v: 0.0 for v in adj}
-        sigma[start_id] = 1.0
+        sigma = [0.0] * n
+        sigma[source] = 1.0
 
-        # list of predecessors of v on shortest paths from start_id
-        pred = {v: [] for v in adj}
+        pred: list = [None] * n
+        pred_edges: list = [None] * n
+        pred[source] = []
+        pred_edges[source] = []
 
-        visited = set()
-        heap: list[HeapItem] = []
+        visited = bytearray(n)
+        heap: list[tuple[float, int]] = [(0.0, source)]
 
         # nodes in nondecreasing distance order (push when finalized)
-        S: list[str] = []
-
-        hq.heappush(heap, HeapItem(start_id, 0))
+        S: list[int] = []
 
         while heap:
-            item = hq.heappop(heap)
-            current_id = item.get_node_id()
-            distance = item.get_distance()
+            distance, current = heappop(heap)
 
-            if distance != distances[current_id]:
+            # A node is only pushed again with a strictly shorter distance,
+            # so any entry that doesn't match its distance is stale
+            if distance != distances[current]:
                 continue
 
-            if current_id in visited:
+            visited[current] = 1
+            S.append(current)
+            sigma_current = sigma[current]
+
+            for i in range(offsets[current], offsets[current + 1]):
+                neighbour = neighbours[i]
+                if visited[neighbour]:
+                    continue
+
+                new_dist = distance + weights[i]
+
+                if new_dist < distances[neighbour]:
+                    distances[neighbour] = new_dist
+                    heappush(heap, (new_dist, neighbour))
+
+                    sigma[neighbour] = sigma_current
+                    pred[neighbour] = [current]
+                    pred_edges[neighbour] = [edge_ids[i]]
+                elif new_dist == distances[neighbour]:
+                    sigma[neighbour] += sigma_current
+                    pred[neighbour].append(current)
+                    pred_edges[neighbour].append(edge_ids[i])
+
+        return distances, pred, pred_edges, sigma, S
+
+    def sssp(self, source: int, target: int = -1) -> tuple:
+        """
+            Distance-only Dijkstras over the CSR snapshot, for callers that
+            don't need predecessor lists or path counts.
+            If a target node ID is given, stops as soon as the target's
+            distance is final (other distances may then be incomplete).
+            Returns a tuple in order of:
+            Shortest distances indexed by node ID,
+            Parent node ID of each node on one shortest path (-1 if none).
+        """
+        csr = self.csr
+        offsets = csr.offsets
+        neighbours = csr.neighbours
+        weights = csr.weights
+        n = csr.node_count()
+
+        distances = [float("inf")] * n
+        distances[source] = 0.0
+        parent = [-1] * n
+
+        heap: list[tuple[float, int]] = [(0.0, source)]
+
+        while heap:
+            distance, current = heappop(heap)
+
+            if distance != distances[current]:
                 continue
+            if current == target:
+                break
 
-            visited.add(current_id)
-            S.append(current_id)
+            for i in range(offsets[current], offsets[current + 1]):
+                neighbour = neighbours[i]
+                new_dist = distance + weights[i]
 
-            for neighbour_id, weight in adj[current_id].items():
-                if neighbour_id in visited:
-                    continue
+                if new_dist < distances[neighbour]:
+                    distances[neighbour] = new_dist
+                    parent[neighbour] = current
+                    heappush(heap, (new_dist, neighbour))
+
+        return distances, parent
 
-                new_dist = distances[current_id] + weight
+    def distances(self, start_id: str, target_id: str = None):
+        """
+            Shortest distances from a start node, without tracking
+            predecessors or path counts.
+            Returns a dictionary of distances to every node, or just the
+            distance to target_id if given (stopping early once reached).
+        """
+        index = self.csr.index
+        if target_id is not None:
+            return self.sssp(index[start_id], index[target_id])[0][index[target_id]]
+        return dict(zip(self.csr.ids, self.sssp(index[start_id])[0]))
 
-                if new_dist < distances[neighbour_id]:
-                    distances[neighbour_id] = new_dist
-                    hq.heappush(heap, HeapItem(neighbour_id, new_dist))
+    def shortest_path(self, start_id: str, target_id: str) -> tuple:
+        """
+            Point-to-point shortest path query, stopping as soon as the
+            target is reached.
+            Returns a tuple of the path cost and the list of nodes on one
+            shortest path (empty if the target is unreachable).
+        """
+        ids = self.csr.ids
+        source, target = self.csr.index[start_id], self.csr.index[target_id]
+        distances, parent = self.sssp(source, target)
 
-                    sigma[neighbour_id] = sigma[current_id]
-                    pred[neighbour_id] = [current_id]
-                elif new_dist == distances[neighbour_id]:
-                    sigma[neighbour_id] += sigma[current_id]
-                    pred[neighbour_id].append(current_id)
+        if distances[target] == float("inf"):
+            return float("inf"), []
 
-        return distances, pred, sigma, S
+        path = [target]
+        while path[-1] != source:
+            path.append(parent[path[-1]])
+        return distances[target], [ids[v] for v in reversed(path)]
+
+    def next_hop_columns(self, destinations: range) -> list[list]:
+        """
+            Runs one SPF per destination node ID. On an undirected graph a
+            node's predecessors in the destination's tree are its ECMP next
+            hops towards it. Returns, per destination, each node's sorted
+            tuple of next hop node IDs (None for the destination itself
+            and for nodes that cannot reach it).
+        """
+        columns = []
+        for d in destinations:
+            pred = self.spf(d)[1]
+            pred[d] = None
+            columns.append([tuple(sorted(p)) if p else None for p in pred])
+        return columns
 
     # BFS + DFS will help identify all traversable nodes in the graph (defines graphs connectivity)
 
@@ -116,21 +207,24 @@ class PathFinder:
             Will traverse every node in the graph and
             return all nodes it visits.
         """
+        offsets = self.csr.offsets
+        neighbours = self.csr.neighbours
         queue = Queue()
-        visited = set()
-        
-        queue.put(start_id)
-        visited.add(start_id)
+        visited = bytearray(self.csr.node_count())
+
+        start = self.csr.index[start_id]
+        queue.put(start)
+        visited[start] = 1
 
         while queue.qsize() > 0:
-            cur_id = queue.get()
-            neighbours = self.graph.get_nodes()[cur_id]
+            cur = queue.get()
 
-            for neighbour_id in neighbours:
-                if neighbour_id not in visited:
-                    queue.put(neighbour_id)
-                    visited.add(neighbour_id)
-        return visited
+            for i in range(offsets[cur], offsets[cur + 1]):
+                neighbour = neighbours[i]
+                if not visited[neighbour]:
+                    queue.put(neighbour)
+                    visited[neighbour] = 1
+        return self.__visited_ids(visited)
 
     def DFS(self, start_id: str) -> set:
         """
@@ -139,23 +233,30 @@ class PathFinder:
             Will traverse every node in the graph and
             return all nodes it visits.
         """
+        offsets = self.csr.offsets
+        neighbours = self.csr.neighbours
         stack = []
-        visited = set()
+        visited = bytearray(self.csr.node_count())
 
-        stack.append(start_id)
-        visited.add(start_id)
+        start = self.csr.index[start_id]
+        stack.append(start)
+        visited[start] = 1
 
         while len(stack) > 0:
-            cur_id = stack.pop()
-            neighbours = self.graph.get_nodes()[cur_id]
+            cur = stack.pop()
+
+            for i in range(offsets[cur], offsets[cur + 1]):
+                neighbour = neighbours[i]
+                if not visited[neighbour]:
+                    stack.append(neighbour)
+                    visited[neighbour] = 1
+        return self.__visited_ids(visited)
 
-            for neighbour_id in neighbours:
-                if neighbour_id not in visited:
-                    stack.append(neighbour_id)
-                    visited.add(neighbour_id)
-        return visited
-    
-    def brandes(self, node1: str = None) -> tuple:
+    def __visited_ids(self, visited: bytearray) -> set:
+        ids = self.csr.ids
+        return {ids[v] for v, seen in enumerate(visited) if seen}
+
+    def brandes(self, node1: str = None, distances: list = None, workers: int = 1) -> tuple:
         """
             Brandes' will calculate the betweeness of nodes and
             edges in the graph using Dijkstras.
@@ -164,131 +265,184 @@ class PathFinder:
             Centrality Betweeness,
             Edge Betweeness,
             Edge flow.
+            If a distances list is given, it is filled with every
+            source's shortest distance row (see accumulate).
+            Sources are split across a process pool when workers > 1.
         """
+        csr = self.csr
 
-        V = list(self.graph.get_nodes().keys())
+        if node1 and node1 not in csr.index:
+            raise ValueError("Node does not exist in current graph")
 
-        CB = {v: 0.0 for v in V} if not node1 else {node1: 0.0} # Betweenness centrality of either all nodes or nodes between source and target
-        EB = {} # Edge betweenness
-        edge_flow = {} # flow count for edges in fastest path
-        
         if not node1:
-            for u in V:
-                for v in self.graph.get_edges(u):
-                    if u == v:
-                        continue
-                    e = (u,v) if u < v else (v,u)
-                    EB[e] = 0
-                    edge_flow[e] = 0
-
-            for s in V:
-                # Distance + pred + sigma + stack order
-                _, pred, sigma, S = self.dijkstras(s)
-                flow_delta = {v: 0.0 for v in V}
-
-                for t in V:
-                    if t != s and sigma[t] > 0:   # reachable
-                        flow_delta[t] += 1.0
-                        
-                # dependency accumulation
-                delta = {v: 0.0 for v in V}
-
-                # Process nodes in reverse order of distance from s
-                while S:
-                    w = S.pop()
-                    if sigma[w] == 0:
-                        continue
-                    
-                    for v in pred[w]:
-                        if v == w:
-                            continue
-                        
-                        share = (sigma[v] / sigma[w]) * flow_delta[w]
-                        c = (sigma[v] / sigma[w]) * (1.0 + delta[w])
-                        delta[v] += c
-
-                        e = (v, w) if v < w else (w, v)
-
-                        if e in edge_flow:
-                            edge_flow[e] += share
-
-                        flow_delta[v] += share
-
-                        if e not in EB:
-                            continue
-
-                        EB[e] += c
-
-                    if w != s:
-                        CB[w] += delta[w]
-            
-            # Undirected graphs: each shortest path counted twice (s->t and t->s)
-            for v in CB:
-                CB[v] /= 2.0
-            for e in EB:
-                EB[e] /= 2.0
-            for f in edge_flow:
-                edge_flow[f] /= 2.0
-        else:
-            # Single-node mode: compute CB for node1, and EB/edge_flow for edges incident to node1
-            if node1 not in V:
-                raise ValueError("Node does not exist in current graph")
-
-            edges = self.graph.get_edges(node1)
-            # initialise node1 neighbours
-            for neighbour in edges:
-                if neighbour == node1:
-                    continue
-                e = (node1, neighbour) if node1 < neighbour else (neighbour, node1)
-                EB[e] = 0.0
-                edge_flow[e] = 0.0
-
-            for s in V:
-                # Run Dijkstra from each source
-                _, pred, sigma, S = self.dijkstras(s)
-
-                # flow demand: 1 unit to every reachable target t != s
-                flow_delta = {v: 0.0 for v in V}
-                for t in V:
-                    if t != s and sigma[t] > 0:
-                        flow_delta[t] = 1.0
-
-                # Brandes dependency accumulation
-                delta = {v: 0.0 for v in V}
-
-                while S:
-                    w = S.pop()
-                    if sigma[w] == 0:
-                        continue
-
-                    for v in pred[w]:
-                        if v == w:
-                            continue
+            return self.brandes_batch(distances, workers)[:3]
+
+        CB, EB, edge_flow = self.accumulate_partitioned(distances, workers)
+
+        # Single-node mode: CB for node1, and EB/edge_flow for edges incident to node1
+        i = csr.index[node1]
+        incident = [
+            csr.edge_ids[k]
+            for k in range(csr.offsets[i], csr.offsets[i + 1])
+            if csr.neighbours[k] != i
+        ]
+        return (
+            {node1: CB[i] / 2.0},
+            {csr.edge_key(e): EB[e] / 2.0 for e in incident},
+            {csr.edge_key(e): edge_flow[e] / 2.0 for e in incident},
+        )
+
+    def brandes_batch(self, distances: list = None, workers: int = 1, sources: list[int] = None) -> tuple:
+        """
+            Batched Brandes' for every node from a single all-sources pass.
+            Returns a tuple containing in order of:
+            Centrality Betweeness of every node,
+            Edge Betweeness of every edge,
+            Edge flow of every edge,
+            Node flow, the total edge flow over each node's incident links
+            (the sum of brandes(node)[2] for that node).
+            Sources are split across a process pool when workers > 1.
+            If a sample of source node IDs is given, only those are run
+            and totals are scaled up to estimate the full pass (see sampling).
+        """
+        CB, EB, edge_flow = self.accumulate_partitioned(distances, workers, sources)
+        return self.brandes_totals(CB, EB, edge_flow, self.csr.node_count() if sources is None else len(sources))
 
-                        share = (sigma[v] / sigma[w]) * flow_delta[w]
-                        c = (sigma[v] / sigma[w]) * (1.0 + delta[w])
-                        delta[v] += c
+    def brandes_totals(self, CB: list, EB: list, edge_flow: list, samples: int) -> tuple:
+        """
+            Turns undivided accumulate totals from the given number of
+            sources into brandes_batch results, scaling them up by
+            n / samples when only a sample of sources was run.
+        """
+        csr = self.csr
+        offsets = csr.offsets
+        neighbours = csr.neighbours
+        edge_ids = csr.edge_ids
+
+        # Undirected graphs: each shortest path counted twice (s->t and t->s)
+        half = 2.0 if samples == csr.node_count() else 2.0 * samples / csr.node_count()
+        CB = [c / half for c in CB]
+        EB = [b / half for b in EB]
+        edge_flow = [f / half for f in edge_flow]
+
+        # self-loops are never on a shortest path, so they are left out
+        links = [e for e in range(csr.edge_count()) if csr.edges[2 * e] != csr.edges[2 * e + 1]]
+
+        node_flow = {}
+        for i, v in enumerate(csr.ids):
+            flow = 0
+            for k in range(offsets[i], offsets[i + 1]):
+                if neighbours[k] != i:
+                    flow += edge_flow[edge_ids[k]]
+            node_flow[v] = flow
+
+        return (
+            {v: CB[i] for i, v in enumerate(csr.ids)},
+            {csr.edge_key(e): EB[e] for e in links},
+            {csr.edge_key(e): edge_flow[e] for e in links},
+            node_flow,
+        )
+
+    def source_partitions(self, sources: list[int] = None) -> list:
+        """
+            Splits all source node IDs (or the given sources) into
+            fixed-size partitions.
+        """
+        if sources is not None:
+            return [sources[i:i + PARTITION_SIZE] for i in range(0, len(sources), PARTITION_SIZE)]
+        n = self.csr.node_count()
+        return [range(i, min(i + PARTITION_SIZE, n)) for i in range(0, n, PARTITION_SIZE)]
 
-                        e = (v, w) if v < w else (w, v)
+    def accumulate_partitioned(self, distances: list = None, workers: int = 1, sources: list[int] = None) -> tuple:
+        """
+            Brandes' dependency accumulation over all sources (or the given
+            sources), one partition at a time, merging partial totals in
+            partition order.
+            With workers > 1 partitions run in a process pool (see parallel);
+            results are identical to the serial run.
+        """
+        n = self.csr.node_count()
+        m = self.csr.edge_count()
+        partitions = self.source_partitions(sources)
 
-                        # Only track edges incident to node1
-                        if e in edge_flow:
-                            edge_flow[e] += share
-                        if e in EB:
-                            EB[e] += c
+        if workers > 1 and len(partitions) > 1:
+            from parallel import map_partitions
+            partials = map_partitions(self.csr, partitions, workers, distances is not None)
+        else:
+            partials = (self.accumulate_partition(sources, distances is not None) for sources in partitions)
 
-                        flow_delta[v] += share
+        CB = [0.0] * n
+        EB = [0.0] * m
+        edge_flow = [0.0] * m
 
-                    if w != s and w == node1:
-                        CB[node1] += delta[w]
+        for cb, eb, flow, rows in partials:
+            CB = list(map(add, CB, cb))
+            EB = list(map(add, EB, eb))
+            edge_flow = list(map(add, edge_flow, flow))
+            if distances is not None:
+                distances.extend(rows)
 
-            # Undirected correction (each s->t counted twice)
-            CB[node1] /= 2.0
-            for e in EB:
-                EB[e] /= 2.0
-            for e in edge_flow:
-                edge_flow[e] /= 2.0
+        return CB, EB, edge_flow
 
+    def accumulate_partition(self, sources: range, keep_rows: bool = False) -> tuple:
+        """
+            Runs accumulate over one partition of sources.
+            Returns its partial totals, plus the partition's distance
+            rows if keep_rows is set (otherwise None).
+        """
+        rows = [] if keep_rows else None
+        return self.accumulate(sources, rows) + (rows,)
 
+    def accumulate(self, sources, distances: list = None) -> tuple:
+        """
+            Brandes' dependency accumulation over the given source node IDs.
+            Returns undivided (directed) totals as lists indexed by node ID
+            and edge ID, in order of:
+            Centrality Betweeness,
+            Edge Betweeness,
+            Edge flow.
+            If a distances list is given, each source's shortest
+            distance row is appended to it as it is computed.
+        """
+        n = self.csr.node_count()
+        m = self.csr.edge_count()
+
+        CB = [0.0] * n
+        EB = [0.0] * m
+        edge_flow = [0.0] * m
+
+        for s in sources:
+            # Distance + pred + sigma + stack order
+            dist, pred, pred_edges, sigma, S = self.spf(s)
+            if distances is not None:
+                distances.append(array("d", dist))
+
+            # flow demand: 1 unit to every reachable target t != s
+            flow_delta = [0.0] * n
+            for t in S:
+                if t != s:
+                    flow_delta[t] = 1.0
+
+            # dependency accumulation
+            delta = [0.0] * n
+
+            # Process nodes in reverse order of distance from s
+            while S:
+                w = S.pop()
+                sigma_w = sigma[w]
+                flow_w = flow_delta[w]
+                dependency_w = 1.0 + delta[w]
+
+                for v, e in zip(pred[w], pred_edges[w]):
+                    ratio = sigma[v] / sigma_w
+                    share = ratio * flow_w
+                    c = ratio * dependency_w
+                    delta[v] += c
+                    flow_delta[v] += share
+                    EB[e] += c
+                    edge_flow[e] += share
+
+                if w != s:
+                    CB[w] += delta[w]
 
         return CB, EB, edge_flow
@@ -0,0 +1,139 @@
+import math
+import random as rand
+import time
+from operator import add
+from pathfinder import PathFinder, PARTITION_SIZE
+
+# Approximate Brandes' settings (see set_approximation); off by default
+__epsilon: float = None
+__delta: float = 0.1
+__time_budget: float = None
+__min_nodes: int = 2000
+__seed: int = 0
+
+def set_approximation(epsilon: float = None, delta: float = 0.1, time_budget: float = None,
+                      min_nodes: int = 2000, seed: int = 0) -> None:
+    """
+        Makes the shared metric context estimate betweenness, edge
+        betweenness and flow counts from a sample of sources on graphs
+        of at least min_nodes nodes. Sample either until the error is at
+        most epsilon with probability 1 - delta, or for time_budget seconds.
+        Leaving both epsilon and time_budget as None turns it off.
+    """
+    global __epsilon, __delta, __time_budget, __min_nodes, __seed
+    check_settings(epsilon, delta, time_budget)
+    __epsilon = epsilon
+    __delta = delta
+    __time_budget = time_budget
+    __min_nodes = min_nodes
+    __seed = seed
+
+def get_settings() -> tuple:
+    """
+        Returns the set_approximation arguments in effect.
+    """
+    return __epsilon, __delta, __time_budget, __min_nodes, __seed
+
+def get_approximation(n: int, epsilon: float = None, time_budget: float = None) -> tuple:
+    """
+        Returns the (epsilon, delta, time_budget, seed) sampling to use for
+        a graph of n nodes, or None if it should be computed exactly.
+        An epsilon or time budget given here overrides the settings.
+    """
+    if epsilon is not None or time_budget is not None:
+        check_settings(epsilon, __delta, time_budget)
+        return epsilon, __delta, time_budget, __seed
+    if (__epsilon is None and __time_budget is None) or n < __min_nodes:
+        return None
+    return __epsilon, __delta, __time_budget, __seed
+
+def check_settings(epsilon: float, delta: float, time_budget: float) -> None:
+    if epsilon is not None and not 0 < epsilon < 1:
+        raise ValueError("Epsilon must be between 0 and 1")
+    if not 0 < delta < 1:
+        raise ValueError("Delta must be between 0 and 1")
+    if time_budget is not None and time_budget <= 0:
+        raise ValueError("Time budget must be positive")
+
+def estimate_count(n: int, m: int) -> int:
+    """
+        Number of values estimated at once: betweenness and node flow
+        per node, edge betweenness and flow per edge.
+    """
+    return 2 * n + 2 * m
+
+def sample_size(estimates: int, epsilon: float, delta: float) -> int:
+    """
+        Sources needed so that every one of the estimates is within epsilon
+        of its true normalised value with probability at least 1 - delta
+        (Hoeffding's inequality with a union bound over the estimates).
+    """
+    return math.ceil(math.log(2 * estimates / delta) / (2 * epsilon ** 2))
+
+def error_bound(samples: int, estimates: int, delta: float) -> float:
+    """
+        Normalised error reached with the given number of sources,
+        the inverse of sample_size.
+    """
+    return math.sqrt(math.log(2 * estimates / delta) / (2 * samples))
+
+def sampled_brandes(pf: PathFinder, epsilon: float = None, delta: float = 0.1,
+                    time_budget: float = None, seed: int = 0, workers: int = 1) -> tuple:
+    """
+        Estimates PathFinder.brandes_batch() results by running Brandes'
+        from a uniform sample of sources and scaling the totals up.
+        The sample is sized for epsilon (run on workers processes), or grows
+        one partition at a time until time_budget seconds have passed.
+        Returns a tuple of the four brandes_batch results and the error
+        bound reached (see bound_report).
+    """
+    check_settings(epsilon, delta, time_budget)
+    if epsilon is None and time_budget is None:
+        raise ValueError("Epsilon or time budget must be specified")
+
+    csr = pf.csr
+    n = csr.node_count()
+    order = rand.Random(seed).sample(range(n), n)
+
+    if time_budget is None:
+        k = min(n, sample_size(estimate_count(n, csr.edge_count()), epsilon, delta))
+        # partition sources in node ID order, so results match for any worker count
+        results = pf.brandes_batch(None, workers, sorted(order[:k]) if k < n else None)
+        return results, bound_report(n, csr.edge_count(), k, delta)
+
+    deadline = time.perf_counter() + time_budget
+    CB = [0.0] * n
+    EB = [0.0] * csr.edge_count()
+    edge_flow = [0.0] * csr.edge_count()
+    k = 0
+    while k < n:
+        cb, eb, flow = pf.accumulate(order[k:k + PARTITION_SIZE])
+        CB = list(map(add, CB, cb))
+        EB = list(map(add, EB, eb))
+        edge_flow = list(map(add, edge_flow, flow))
+        k = min(n, k + PARTITION_SIZE)
+        if time.perf_counter() >= deadline:
+            break
+
+    return pf.brandes_totals(CB, EB, edge_flow, k), bound_report(n, csr.edge_count(), k, delta)
+
+def bound_report(n: int, m: int, samples: int, delta: float) -> dict:
+    """
+        Describes the error of estimates from the given number of sources.
+        Each value is within its bound of the exact result with probability
+        at least 1 - delta; all bounds are 0 when every source was run.
+    """
+    epsilon = 0.0 if samples >= n else error_bound(samples, estimate_count(n, m), delta)
+    # epsilon is relative to the largest possible total of each estimate:
+    # one source adds at most n - 2 to a node's betweenness, n - 1 to an
+    # edge's betweenness or flow, and 2(n - 1) to a node's flow
+    return {
+        "samples": samples,
+        "sources": n,
+        "delta": delta,
+        "epsilon": epsilon,
+        "betweenness": epsilon * n * max(n - 2, 0) / 2,
+        "edge_betweenness": epsilon * n * (n - 1) / 2,
+        "flow_count": epsilon * n * (n - 1) / 2,
+        "node_flow_count": epsilon * n * (n - 1),
+    }
@@ -0,0 +1,136 @@
+import json
+import mmap
+import struct
+from csr import CSRGraph
+
+# Binary topology snapshot (little-endian, sections 8-byte aligned):
+#   header    magic, format version, flags, node count n, slot count (2 x links),
+#             edge count m, node name bytes, from version 2 the sequence
+#             number of the last journal record included (see journal.py)
+#             and from version 3 the node attribute bytes, from version 4
+#             the fingerprint of the topology file the journal started from
+#   offsets   int64[n + 1]     CSR row offsets
+#   neighbours int64[slots]    neighbour node IDs
+#   weights   float64[slots]   link costs
+#   edge_ids  int64[slots]     undirected edge ID of each slot
+#   edges     int64[2m]        edge endpoints
+#   names     utf-8 node names separated by NUL bytes
+#   attributes utf-8 JSON object of node attribute columns (see Graph.attribute_columns)
+MAGIC = b"NISNAP"
+FORMAT_VERSION = 4
+HEADER = struct.Struct("<6sHHQQQQ")
+SEQUENCE = struct.Struct("<Q")
+ATTRIBUTES = struct.Struct("<Q")
+SOURCE = struct.Struct("<32s")
+HEADER_SIZES = {1: 48, 2: 56, 3: 64, 4: 96}
+
+SNAPSHOT_EXTENSION = ".nisnap"
+
+def save_snapshot(csr: CSRGraph, path: str, sequence: int = 0, attributes: dict[str, list] = None,
+                  source: bytes = b"") -> None:
+    """
+        Writes a CSR snapshot to a binary snapshot file.
+        sequence records the last journal entry the snapshot includes,
+        attributes the node attribute columns, in node order, and source
+        the fingerprint of the topology file the journal started from
+        (see load_topology.topology_fingerprint).
+    """
+    if any("\0" in node for node in csr.ids):
+        raise ValueError("Node names cannot contain NUL characters")
+    names = "\0".join(csr.ids).encode("utf-8")
+    attrs = json.dumps(attributes or {}).encode("utf-8")
+    n, slots, m = csr.node_count(), len(csr.neighbours), csr.edge_count()
+
+    with open(path, "wb") as f:
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, n, slots, m, len(names)) \
+            + SEQUENCE.pack(sequence) + ATTRIBUTES.pack(len(attrs)) + SOURCE.pack(source)
+        f.write(header.ljust(HEADER_SIZES[FORMAT_VERSION], b"\0"))
+        for section in csr.arrays():
+            f.write(section.tobytes())
+        f.write(names)
+        f.write(attrs)
+
+def load_snapshot(path: str) -> CSRGraph:
+    """
+        Memory-maps a binary snapshot file as a CSR snapshot.
+        Adjacency arrays are read straight from the mapped file
+        rather than copied.
+    """
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    version, n, slots, m, names_len = __read_header(buf)[:5]
+
+    view = memoryview(buf)
+    pos = HEADER_SIZES[version]
+    sections = []
+    for typecode, count in (("q", n + 1), ("q", slots), ("d", slots), ("q", slots), ("q", 2 * m)):
+        sections.append(view[pos:pos + 8 * count].cast(typecode))
+        pos += 8 * count
+
+    names = bytes(view[pos:pos + names_len]).decode("utf-8")
+    ids = names.split("\0") if n else []
+    if len(ids) != n:
+        raise ValueError("Corrupt topology snapshot")
+
+    return CSRGraph(ids, *sections)
+
+def read_sequence(path: str) -> int:
+    """
+        Returns the last journal sequence number included in a snapshot
+        (0 for snapshots saved without a journal).
+    """
+    with open(path, "rb") as f:
+        return __read_header(f.read(max(HEADER_SIZES.values())))[5]
+
+def read_attributes(path: str) -> dict[str, list]:
+    """
+        Returns the node attribute columns saved in a snapshot
+        (empty for snapshots from before format version 3).
+    """
+    with open(path, "rb") as f:
+        version, n, slots, m, names_len, _, attrs_len, _ = __read_header(f.read(max(HEADER_SIZES.values())))
+        if not attrs_len:
+            return {}
+        f.seek(HEADER_SIZES[version] + 8 * (n + 1 + 3 * slots + 2 * m) + names_len)
+        return json.loads(f.read(attrs_len).decode("utf-8"))
+
+def read_source(path: str) -> bytes:
+    """
+        Returns the fingerprint of the topology file a snapshot's journal
+        started from (empty for snapshots saved without one).
+    """
+    with open(path, "rb") as f:
+        return __read_header(f.read(max(HEADER_SIZES.values())))[7]
+
+def __read_header(buf) -> tuple:
+    """
+        Validates a snapshot header. Returns a tuple in order of:
+        format version, node count, slot count, edge count,
+        node name bytes, journal sequence number, node attribute bytes,
+        source topology fingerprint.
+    """
+    if len(buf) < HEADER.size:
+        raise ValueError("Not a topology snapshot")
+    magic, version, _, n, slots, m, names_len = HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError("Not a topology snapshot")
+    if version not in HEADER_SIZES:
+        raise ValueError(f"Unsupported snapshot format version {version}")
+
+    sequence = SEQUENCE.unpack_from(buf, HEADER.size)[0] if version >= 2 else 0
+    attrs_len = ATTRIBUTES.unpack_from(buf, HEADER.size + SEQUENCE.size)[0] if version >= 3 else 0
+    source = SOURCE.unpack_from(buf, HEADER.size + SEQUENCE.size + ATTRIBUTES.size)[0] if version >= 4 else b""
+    return version, n, slots, m, names_len, sequence, attrs_len, source if any(source) else b""
+
+if __name__ == "__main__":
+    import argparse
+    from graph import Graph
+
+    parser = argparse.ArgumentParser(description="Convert a JSON topology to a binary snapshot")
+    parser.add_argument("topology", help="JSON topology file")
+    parser.add_argument("output", nargs="?", help=f"snapshot file (default: topology name with {SNAPSHOT_EXTENSION})")
+    args = parser.parse_args()
+
+    output = args.output or args.topology.rsplit(".", 1)[0] + SNAPSHOT_EXTENSION
+    Graph(args.topology).save_snapshot(output)
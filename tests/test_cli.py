@@ -0,0 +1,48 @@
+import glob
+import json
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import cli
+import generators
+from journal import open_graph
+from load_topology import data_path, resource_path
+
+NAME = "cli_test_topology"
+
+def run(tmp_path, topology: str, *args: str) -> dict:
+    output = str(tmp_path / "result.json")
+    cli.main(["-t", topology, "-o", output, *args])
+    with open(output, encoding="utf-8") as f:
+        return json.load(f)
+
+def test_saved_changes_only_apply_to_their_topology(tmp_path):
+    menu = tmp_path / "menu" / f"{NAME}.json"
+    other = tmp_path / "other" / f"{NAME}.json"
+    menu.parent.mkdir()
+    other.parent.mkdir()
+    shutil.copy(resource_path("topology.json"), menu)
+    with open(other, "w", encoding="utf-8") as f:
+        json.dump(generators.ring_of_sites(5, 8, seed=1), f)
+
+    try:
+        # a menu edit, compacted into the saved snapshot
+        graph = open_graph(str(menu))
+        graph.remove_node("CenRouter")
+        graph.journal.compact(wait=True)
+        graph.journal.close()
+
+        edited = run(tmp_path, str(menu), "spf", "ManRouter")["distances"]
+        assert "CenRouter" not in edited
+        assert "CenRouter" in run(tmp_path, str(menu), "--ignore-saved", "spf", "ManRouter")["distances"]
+
+        # same file name, different topology: loaded as it is
+        metrics = ["metrics", "-m", "average_shortest_path", "node_to_edge_ratio"]
+        assert run(tmp_path, str(other), *metrics) == run(tmp_path, str(other), "--ignore-saved", *metrics)
+        assert len(run(tmp_path, str(other), "spf", "Site0-R0")["distances"]) == 40
+    finally:
+        for path in glob.glob(data_path(f"{NAME}.saved") + "*"):
+            os.remove(path)